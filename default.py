@@ -3,3 +3,24 @@ output_path = 'output'
 
 # file name of csv file used for storing intermediate results
 file_name_intermediate_results = "intermediate_results.csv"
+
+# file name of the JSON file used for storing the config of a training session started with train.py
+file_name_train_config = "train_config.json"
+
+# file name of the genome file used for storing the population of the last checkpoint
+file_name_checkpoint = "checkpoint.genome"
+
+# file name of the JSON file used for storing the state of the optimizer at the last checkpoint
+file_name_checkpoint_state = "checkpoint_state.json"
+
+# file name of the genome file used for storing the population when it is kept out of memory
+file_name_population = "population.genome"
+
+# file name of csv file used for storing the memory usage of each phase of a generation
+file_name_memory_usage = "memory_usage.csv"
+
+# file name of csv file used for storing the decisions of the training controller
+file_name_controller_events = "controller_events.csv"
+
+# name of the folder in the output folder used for storing the move log file of each generation
+folder_name_move_logs = "move_logs"
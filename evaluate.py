@@ -0,0 +1,86 @@
+""" Evaluate saved snakes on many apple seeds. Each genome plays a game on every seed, the score and fitness
+distributions are summarized with percentiles and bootstrap confidence intervals and written to evaluation.csv.
+
+Usage:
+    python evaluate.py --genome best.genome [other.genome best_snake_generatie-100_score-20.obj ...]
+        [--archive output/<session>/hall_of_fame.archive --generations 100 200 | --top 5] [--n-seeds 10000]
+"""
+import argparse
+import os
+
+import numpy as np
+
+
+def load_evaluation_genomes(genome_paths=(), archive_path=None, generations=(), top=0):
+    """ Load the genomes that are evaluated
+
+    Args:
+        genome_paths (list): paths to genome files or pickled snakes. All genomes of a genome file are evaluated
+        archive_path (str): path to genome archive
+        generations (list): generations of the archive that are evaluated
+        top (int): number of best generations of the archive that are evaluated
+
+    Returns:
+        list: list of (name, DNA values, grid size) tuples
+    """
+    from functions.genome_archive import GenomeArchive
+    from functions.genome_file import load_genomes
+    from functions.migrate_genomes import read_snake_file
+
+    genomes = []
+    for path in genome_paths:
+        if path.endswith('.obj'):
+            dna, _, _, grid_size = read_snake_file(path)
+            genomes.append((os.path.basename(path), dna, grid_size))
+            continue
+        header, dna = load_genomes(path)
+        names = [os.path.basename(path)] if len(dna) == 1 else \
+            ['%s[%i]' % (os.path.basename(path), i) for i in range(len(dna))]
+        genomes += [(name, genome, header['grid_size']) for name, genome in zip(names, dna)]
+
+    if archive_path is not None:
+        archive = GenomeArchive(archive_path, mode='r')
+        generations = list(generations) + [int(record['generation']) for record in archive.top(top)]
+        genomes += [('generation %i' % generation, archive.get_dna(generation), archive.grid_size)
+                    for generation in generations]
+    if not genomes:
+        raise ValueError("No genomes given")
+    return genomes
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Evaluate saved snakes on many apple seeds")
+    parser.add_argument('--genome', nargs='*', default=[], help="genome files or pickled snakes")
+    parser.add_argument('--archive', help="genome archive")
+    parser.add_argument('--generations', nargs='*', type=int, default=[], help="generations of the archive")
+    parser.add_argument('--top', type=int, default=0, help="evaluate the best n generations of the archive")
+    parser.add_argument('--n-seeds', type=int, default=10000, help="number of games per genome")
+    parser.add_argument('--first-seed', type=int, default=0, help="apple seed of the first game")
+    parser.add_argument('--n-jobs', type=int, help="number of processes, default is all computer cores")
+    parser.add_argument('--confidence', type=float, default=0.95, help="confidence level of the intervals")
+    parser.add_argument('--n-resamples', type=int, default=1000, help="number of bootstrap resamples")
+    parser.add_argument('--output', default='evaluation.csv', help="path to csv file with the summaries")
+    args = parser.parse_args(args)
+
+    # imported after parsing the arguments, so --help and invalid arguments return immediately
+    from functions.evaluation import evaluate_genomes, write_summaries
+
+    genomes = load_evaluation_genomes(args.genome, args.archive, args.generations, args.top)
+    seeds = np.arange(args.first_seed, args.first_seed + args.n_seeds)
+    summaries, _ = evaluate_genomes(genomes, seeds, args.n_jobs, args.confidence, args.n_resamples)
+    write_summaries(args.output, summaries)
+
+    print("%-40s %24s %8s %8s %8s %8s %24s" % ('genome', 'mean score (CI)', 'p5', 'p50', 'p95', 'max',
+                                              'difference with first'))
+    for summary in summaries:
+        difference = '' if 'score_mean_diff' not in summary else '%+.2f (%+.2f, %+.2f)' % (
+            summary['score_mean_diff'], summary['score_diff_ci_low'], summary['score_diff_ci_high'])
+        print("%-40s %24s %8.0f %8.0f %8.0f %8.0f %24s" % (
+            summary['genome'][:40], '%.2f (%.2f, %.2f)' % (summary['score_mean'], summary['score_ci_low'],
+                                                            summary['score_ci_high']),
+            summary['score_p5'], summary['score_p50'], summary['score_p95'], summary['score_max'], difference))
+    print("Evaluation of %i games per genome written to %s" % (len(seeds), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,10 +14,10 @@ class Brain:
             n_output (int): number of output values
             n_genes (int): number of genes in dna
             dna (np.array): Array of values. Each value represents a gene. The DNA contains the weight and bias values
-                for the neural network
+                for the neural network. Random values when the brain is created without DNA
     """
 
-    def __init__(self):
+    def __init__(self, dna=None):
         # design neural network
         self.n_input = 24
         self.n_hidden_1 = 16
@@ -29,15 +29,16 @@ class Brain:
         n_bias = self.n_hidden_1 + self.n_hidden_2 + self.n_output
 
         self.n_genes = n_weights + n_bias
-        self.dna = self.initialize_dna()
+        self.dna = self.initialize_dna() if dna is None else np.array(dna, dtype=np.float64).reshape(1, -1)
 
     def initialize_dna(self):
-        """ Get random values to initialize dna values
+        """ Get random values to initialize dna values. The values are drawn from a new random generator, so the global
+            np.random state is not used. The optimizers pass the DNA of their snakes, see functions.random_streams
 
         Returns:
             np.array: Array with random values
         """
-        return np.random.rand(1, self.n_genes) * 2 - 1
+        return np.random.default_rng().random((1, self.n_genes)) * 2 - 1
 
     def get_weights_from_dna(self):
         """ get weights and bias terms from DNA
@@ -92,3 +93,53 @@ class Brain:
         return A3
 
 
+def get_weights_from_dna_batch(dna, n_input=24, n_hidden_1=16, n_hidden_2=16, n_output=4):
+    """ Get weights and bias terms of many brains at once. The DNA layout is the same as in Brain.get_weights_from_dna
+
+    Args:
+        dna (np.array): n_brains by n_genes array with the DNA of each brain
+        n_input (int): number of input values
+        n_hidden_1 (int): number of neurons in first hidden layer
+        n_hidden_2 (int): number of neurons in second hidden layer
+        n_output (int): number of output values
+
+    Returns:
+        tuple: tuple containing 6 elements, each with the brains as first dimension:
+            1) weights for first hidden layer
+            2) weights for second hidden layer
+            3) weights for output layer
+            4) bias terms for firs hidden layer
+            5) bias terms for second hidden layer
+            6) bias terms for output layer
+    """
+    n_brains = dna.shape[0]
+    sizes = [n_input*n_hidden_1, n_hidden_1, n_hidden_1*n_hidden_2, n_hidden_2, n_hidden_2*n_output, n_output]
+    W1, B1, W2, B2, W3, B3 = np.split(dna, np.cumsum(sizes)[:-1], axis=1)
+
+    return W1.reshape(n_brains, n_hidden_1, n_input), \
+        W2.reshape(n_brains, n_hidden_2, n_hidden_1), \
+        W3.reshape(n_brains, n_output, n_hidden_2), \
+        B1.reshape(n_brains, n_hidden_1, 1), \
+        B2.reshape(n_brains, n_hidden_2, 1), \
+        B3.reshape(n_brains, n_output, 1)
+
+
+def forward_propagation_batch(weights, X):
+    """ Forward propagation of many networks at once. Each network gets its own input values.
+
+    Args:
+        weights (tuple): weights and bias terms as returned by get_weights_from_dna_batch
+        X (np.array): n_brains by n_input array containing the input values for each neural network
+
+    Returns:
+        np.array: n_brains by n_output array of output values of the neural networks
+    """
+    W1, W2, W3, B1, B2, B3 = weights
+
+    Z1 = np.matmul(W1, X[:, :, None]) + B1
+    A1 = np.maximum(Z1, 0)
+    Z2 = np.matmul(W2, A1) + B2
+    A2 = np.maximum(Z2, 0)
+    Z3 = np.matmul(W3, A2) + B3
+    A3 = Z3
+    return A3[:, :, 0]
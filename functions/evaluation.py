@@ -0,0 +1,170 @@
+import numpy as np
+
+from functions.game_backends import get_num_cores
+from functions.sampling_profiler import profile_worker
+from functions.snake_board import generate_apples
+
+# percentiles of the score and fitness distributions in the evaluation summary
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def play_seeds(dna, seeds, grid_size=10):
+    """ Play a game with one genome for each apple seed. All games are played at once with the vectorized backend
+
+    Args:
+        dna (np.array): DNA values of a single genome
+        seeds (np.array): apple seed of each game
+        grid_size (int): Size of the grid
+
+    Returns:
+        tuple: fitness, number of apples found and number of moves played of each game
+    """
+    from functions.vectorized_snake import play_games_batch
+
+    with profile_worker():
+        random_state = np.random.RandomState()
+        apples = np.stack([generate_apples(grid_size, int(seed), random_state) for seed in seeds])
+        dna = np.repeat(np.asarray(dna, dtype=np.float64).reshape(1, -1), len(seeds), axis=0)
+        return play_games_batch(dna, grid_size, apples)
+
+
+def evaluate_genome(dna, seeds, grid_size=10, n_jobs=None):
+    """ Play a game with a genome for each apple seed. The seeds are divided over parallel processes
+
+    Args:
+        dna (np.array): DNA values of a single genome
+        seeds (np.array): apple seed of each game
+        grid_size (int): Size of the grid
+        n_jobs (int): Number of processes. When None all computer cores are used, when 1 no processes are started
+
+    Returns:
+        dict: fitness, score (number of apples found) and moves (number of moves played) of each game
+    """
+    n_jobs = min(n_jobs or get_num_cores(), len(seeds))
+    chunks = np.array_split(np.asarray(seeds), n_jobs)
+    if n_jobs > 1:
+        from joblib import Parallel, delayed
+
+        results = Parallel(n_jobs=n_jobs)(delayed(play_seeds)(dna, chunk, grid_size) for chunk in chunks)
+    else:
+        results = [play_seeds(dna, chunk, grid_size) for chunk in chunks]
+
+    fitness, score, moves = [np.concatenate(values) for values in zip(*results)]
+    return {'fitness': fitness, 'score': score, 'moves': moves}
+
+
+def bootstrap_ci(values, statistic=np.mean, confidence=0.95, n_resamples=1000, seed=0):
+    """ Bootstrap confidence interval of a statistic
+
+    Args:
+        values (np.array): values of the games
+        statistic (function): statistic of the values, must accept an axis argument
+        confidence (float): confidence level. Value between 0 and 1
+        n_resamples (int): number of bootstrap resamples
+        seed (int): seed of the random generator, so the interval is reproducible
+
+    Returns:
+        tuple: lower and upper bound of the interval
+    """
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=np.float64)
+
+    # resamples are drawn in blocks, so the memory stays bounded for many games
+    block_size = max(1, 10**7 // max(1, values.size))
+    statistics = []
+    for start in range(0, n_resamples, block_size):
+        n_block = min(block_size, n_resamples - start)
+        statistics.append(statistic(values[rng.integers(values.size, size=(n_block, values.size))], axis=1))
+    statistics = np.concatenate(statistics)
+
+    alpha = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(statistics, [alpha, 100 - alpha])
+    return float(lower), float(upper)
+
+
+def summarize(values, confidence=0.95, n_resamples=1000):
+    """ Summarize the distribution of the values of the games
+
+    Args:
+        values (np.array): values of the games
+        confidence (float): confidence level of the interval of the mean
+        n_resamples (int): number of bootstrap resamples
+
+    Returns:
+        dict: mean, bootstrap confidence interval of the mean, standard deviation, minimum, percentiles and maximum
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ci_low, ci_high = bootstrap_ci(values, confidence=confidence, n_resamples=n_resamples)
+    summary = {'mean': float(np.mean(values)),
+               'ci_low': ci_low,
+               'ci_high': ci_high,
+               'std': float(np.std(values)),
+               'min': float(np.min(values))}
+    summary.update(('p%i' % percentile, float(value))
+                   for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+    summary['max'] = float(np.max(values))
+    return summary
+
+
+def compare(values, reference, confidence=0.95, n_resamples=1000):
+    """ Compare two genomes that played the same seeds. Because the games are paired by seed, the confidence interval
+        of the mean difference is much narrower than the intervals of the separate means
+
+    Args:
+        values (np.array): values of the games of a genome
+        reference (np.array): values of the games of the reference genome, for the same seeds
+        confidence (float): confidence level of the interval of the mean difference
+        n_resamples (int): number of bootstrap resamples
+
+    Returns:
+        dict: mean difference and its bootstrap confidence interval
+    """
+    difference = np.asarray(values, dtype=np.float64) - np.asarray(reference, dtype=np.float64)
+    ci_low, ci_high = bootstrap_ci(difference, confidence=confidence, n_resamples=n_resamples)
+    return {'mean_diff': float(np.mean(difference)), 'diff_ci_low': ci_low, 'diff_ci_high': ci_high}
+
+
+def evaluate_genomes(genomes, seeds, n_jobs=None, confidence=0.95, n_resamples=1000):
+    """ Evaluate genomes on the same apple seeds and summarize their score and fitness distributions. The score of
+        each genome is compared with the score of the first genome
+
+    Args:
+        genomes (list): list of (name, DNA values, grid size) tuples
+        seeds (np.array): apple seed of each game
+        n_jobs (int): Number of processes. When None all computer cores are used
+        confidence (float): confidence level of the intervals
+        n_resamples (int): number of bootstrap resamples
+
+    Returns:
+        tuple: list with a summary (dict) of each genome and list with the games (dict) of each genome
+    """
+    summaries, games = [], []
+    for name, dna, grid_size in genomes:
+        genome_games = evaluate_genome(dna, seeds, grid_size, n_jobs)
+        summary = {'genome': name, 'grid_size': grid_size, 'n_games': len(seeds)}
+        for metric in ('score', 'fitness'):
+            summary.update(('%s_%s' % (metric, key), value) for key, value in
+                           summarize(genome_games[metric], confidence, n_resamples).items())
+        summary['moves_mean'] = float(np.mean(genome_games['moves']))
+        if games:
+            summary.update(('score_%s' % key, value) for key, value in
+                           compare(genome_games['score'], games[0]['score'], confidence, n_resamples).items())
+        summaries.append(summary)
+        games.append(genome_games)
+    return summaries, games
+
+
+def write_summaries(path, summaries):
+    """ Write evaluation summaries to a csv file, one row per genome
+
+    Args:
+        path (str): path to csv file
+        summaries (list): summary (dict) of each genome, see evaluate_genomes
+    """
+    columns = []
+    for summary in summaries:
+        columns += [column for column in summary if column not in columns]
+    with open(path, 'w') as file:
+        file.write(','.join(columns) + '\n')
+        for summary in summaries:
+            file.write(','.join(str(summary.get(column, '')) for column in columns) + '\n')
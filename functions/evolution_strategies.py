@@ -0,0 +1,260 @@
+import math
+
+import numpy as np
+
+from functions.genome_file import get_n_genes, get_topology, snake_from_dna, write_genomes
+from functions.optimizer import Optimizer
+from functions.random_streams import get_rng, get_seed
+from functions.sampling_profiler import profile_worker
+
+
+def get_perturbations(seeds, n_genes):
+    """ Generate a Gaussian perturbation for each seed. The same seed gives the same perturbation in every process, so
+        only the seeds have to be sent to the workers
+
+    Args:
+        seeds (np.array): seed of each perturbation
+        n_genes (int): number of genes
+
+    Returns:
+        np.array: len(seeds) by n_genes array with values from a standard normal distribution
+    """
+    return np.stack([np.random.default_rng(int(seed)).standard_normal(n_genes) for seed in seeds])
+
+
+def play_perturbations(mean, sigma, seeds, grid_size=10):
+    """ Play Snake with the antithetic pairs of snakes of the seeds; mean + sigma * perturbation and
+        mean - sigma * perturbation. All games are played at once with the vectorized backend
+
+    Args:
+        mean (np.array): DNA values of the mean genome
+        sigma (float): standard deviation of the perturbations
+        seeds (np.array): seed of the perturbation of each pair
+        grid_size (int): Size of the grid
+
+    Returns:
+        tuple: fitness and number of apples found, both len(seeds) by 2 arrays with the positive and negative
+            perturbation of each pair
+    """
+    from functions.vectorized_snake import play_games_batch
+
+    with profile_worker():
+        noise = sigma * get_perturbations(seeds, mean.size)
+        fitness, total_apples_found, _ = play_games_batch(np.concatenate([mean + noise, mean - noise]), grid_size)
+    n_pairs = len(seeds)
+    return fitness.reshape(2, n_pairs).T, total_apples_found.reshape(2, n_pairs).T
+
+
+def rank_normalize(values):
+    """ Replace values by a weight that only depends on their rank. The best half gets a positive weight that decreases
+        with the log of the rank, the weights sum to 0. Equal values get the same (mean) rank. Compared to ranks that
+        are scaled linearly, the rare snakes that find apples get much more weight than the many snakes that die after
+        a few moves
+
+    Args:
+        values (np.array): values, e.g. fitness
+
+    Returns:
+        np.array: weights with the shape of values
+    """
+    flat = values.reshape(-1)
+    ranks = np.empty(flat.size)
+    ranks[np.argsort(-flat, kind='stable')] = np.arange(1, flat.size + 1)
+    _, inverse = np.unique(flat, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    ranks = (np.bincount(inverse, ranks) / np.bincount(inverse))[inverse]
+
+    utilities = np.maximum(0, np.log(flat.size / 2 + 1) - np.log(ranks))
+    return (utilities / utilities.sum() - 1 / flat.size).reshape(values.shape)
+
+
+class EvolutionStrategies(Optimizer):
+    """
+    Evolution strategies for playing Snake. Instead of a population of snakes, a single mean genome is trained:
+        1) Generate pairs of snakes around the mean genome with Gaussian perturbations; mean + sigma * perturbation and
+           mean - sigma * perturbation (antithetic sampling). Each perturbation is generated from a seed
+        2) Play game
+        3) Replace the fitness of each snake by a weight based on its rank, so the update does not depend on the scale
+           of the fitness
+        4) Move the mean genome in the direction of the perturbations with a higher rank (Adam update)
+        5) repeat steps 1 till 4
+    The workers of the joblib backend receive the mean genome and the seeds of their pairs, and only return the fitness
+    and score of their snakes.
+
+    Attributes:
+        population_size (int): number of snakes played each generation, twice the number of pairs
+        sigma (float): standard deviation of the perturbations
+        learning_rate (float): learning rate of the update of the mean genome
+        grid_size (int): Size of the grid the snakes play on
+        backend (str): 'joblib' to divide the pairs over parallel processes, otherwise all games are played at once in
+            this process. The games are always played with the vectorized backend
+        n_jobs (int): Number of processes used by the joblib backend. When None all computer cores are used
+        seed (int): Seed of the random numbers, see functions.random_streams
+        generation (int): Generation of the mean genome, the perturbations of each generation are different
+        mean (np.array): DNA values of the mean genome
+        seeds (np.array): seed of the perturbation of each pair of the current generation
+        fitness (np.array): fitness of each snake, n_pairs by 2. None before the games are played
+        score (np.array): number of apples found by each snake, n_pairs by 2. None before the games are played
+    """
+
+    def __init__(self, population_size, sigma=0.5, learning_rate=0.1, grid_size=10, backend='vectorized', n_jobs=None,
+                 seed=None):
+        self.population_size = max(2, population_size - population_size % 2)
+        self.sigma = sigma
+        self.learning_rate = learning_rate
+        self.grid_size = grid_size
+        self.backend = backend
+        self.n_jobs = n_jobs
+
+        # the first snakes are random networks around a mean genome of zeros
+        self.seed = get_seed(seed)
+        self.generation = 0
+        self.mean = np.zeros(get_n_genes(get_topology()))
+        self.seeds = None
+        self.fitness = None
+        self.score = None
+
+        # state of the Adam update
+        self._step = 0
+        self._first_moment = np.zeros_like(self.mean)
+        self._second_moment = np.zeros_like(self.mean)
+
+        self.generate_population()
+
+    @classmethod
+    def from_settings(cls, population_size, output_folder, settings):
+        return cls(population_size, settings['es_sigma'], settings['es_learning_rate'], grid_size=settings['grid_size'],
+                   backend=settings['backend'], n_jobs=settings['n_jobs'], seed=settings['seed'])
+
+    def __len__(self):
+        return 2 * len(self.seeds)
+
+    def generate_population(self):
+        """ Generate population
+
+        When no games are played: draw the seeds of the pairs around the mean genome
+        When the games are played: update the mean genome and draw new seeds
+        """
+        if self.fitness is not None:
+            self.update_mean()
+            self.generation += 1
+        self.seeds = get_rng(self.seed, self.generation, 'perturbation').integers(2**63, size=self.population_size // 2)
+        self.fitness = None
+        self.score = None
+
+    def get_gradient(self):
+        """ Estimate the gradient of the rank weights with respect to the mean genome
+
+        Returns:
+            np.array: gradient for each gene
+        """
+        weights = rank_normalize(self.fitness)
+        perturbations = get_perturbations(self.seeds, self.mean.size)
+        return (weights[:, 0] - weights[:, 1]) @ perturbations / self.sigma
+
+    def update_mean(self, beta_1=0.9, beta_2=0.999, epsilon=1e-8):
+        """ Move the mean genome in the direction of the gradient with an Adam step """
+        gradient = self.get_gradient()
+        self._step += 1
+        self._first_moment = beta_1 * self._first_moment + (1 - beta_1) * gradient
+        self._second_moment = beta_2 * self._second_moment + (1 - beta_2) * gradient**2
+        first_moment = self._first_moment / (1 - beta_1**self._step)
+        second_moment = self._second_moment / (1 - beta_2**self._step)
+        self.mean = self.mean + self.learning_rate * first_moment / (np.sqrt(second_moment) + epsilon)
+
+    def resize_population(self, population_size):
+        """ Change the population size. The next population generated by generate_population has the new size
+
+        Args:
+            population_size (int): new population size, rounded down to an even number of snakes
+        """
+        self.population_size = max(2, population_size - population_size % 2)
+
+    def get_state(self):
+        """ Get the population size and the state of the Adam update, which are not saved by save_population
+
+        Returns:
+            dict: state with values that can be saved as JSON
+        """
+        return {'population_size': self.population_size,
+                'adam_step': self._step,
+                'adam_first_moment': self._first_moment.tolist(),
+                'adam_second_moment': self._second_moment.tolist()}
+
+    def set_state(self, state):
+        """ Restore a state of get_state. Call before load_population
+
+        Args:
+            state (dict): state of the optimizer
+        """
+        self.population_size = state['population_size']
+        self._step = state['adam_step']
+        self._first_moment = np.asarray(state['adam_first_moment'], dtype=np.float64)
+        self._second_moment = np.asarray(state['adam_second_moment'], dtype=np.float64)
+
+    def load_population(self, dna, generation=0):
+        """ Continue from the mean of the given DNA, e.g. a checkpoint of EvolutionStrategies (a single genome) or of
+            GeneticAlgorithm (a population)
+
+        Args:
+            dna (np.array): n_genomes by n_genes array with DNA values
+            generation (int): generation of the DNA
+        """
+        self.mean = np.mean(np.asarray(dna, dtype=np.float64), axis=0)
+        self.generation = generation
+        self.generate_population()
+
+    def save_population(self, path, generation):
+        """ Save the mean genome to a genome file
+
+        Args:
+            path (str): path to genome file
+            generation (int): generation of the mean genome
+        """
+        write_genomes(path, self.mean, grid_size=self.grid_size, generation=generation)
+
+    def play_games(self, parallel=True, chunk_size=None):
+        """ Play Snake with each snake in population
+
+        Args:
+            parallel (bool): When True and the backend is joblib the pairs are divided over parallel processes
+            chunk_size (int): Maximum number of games that are in memory at the same time. When None there is no
+                maximum
+        """
+        n_pairs = len(self.seeds)
+        pairs_per_chunk = n_pairs if chunk_size is None else max(1, chunk_size // 2)
+        if parallel and self.backend == 'joblib':
+            from joblib import Parallel, delayed
+            from functions.game_backends import get_num_cores
+
+            n_jobs = self.n_jobs or get_num_cores()
+            pairs_per_chunk = max(1, min(pairs_per_chunk // n_jobs, int(math.ceil(n_pairs / n_jobs))))
+            chunks = [self.seeds[start:start + pairs_per_chunk] for start in range(0, n_pairs, pairs_per_chunk)]
+            results = Parallel(n_jobs=n_jobs, pre_dispatch='n_jobs')(
+                delayed(play_perturbations)(self.mean, self.sigma, chunk, self.grid_size) for chunk in chunks)
+        else:
+            chunks = [self.seeds[start:start + pairs_per_chunk] for start in range(0, n_pairs, pairs_per_chunk)]
+            results = [play_perturbations(self.mean, self.sigma, chunk, self.grid_size) for chunk in chunks]
+
+        self.fitness = np.concatenate([fitness for fitness, _ in results])
+        self.score = np.concatenate([score for _, score in results])
+
+    def get_fitness(self):
+        return self.fitness
+
+    def get_scores(self):
+        return self.score
+
+    def get_best_snake(self):
+        """ Get best snake in population. Its DNA is generated again from the seed of its pair
+
+        Returns:
+            Snake: Snake with the best fitness in population
+        """
+        pair, sign = np.unravel_index(np.argmax(self.fitness), self.fitness.shape)
+        perturbation = get_perturbations(self.seeds[[pair]], self.mean.size)[0]
+        snake = snake_from_dna(self.mean + (1 - 2 * sign) * self.sigma * perturbation, self.grid_size)
+        snake.fitness = float(self.fitness[pair, sign])
+        snake.total_apples_found = int(self.score[pair, sign])
+        snake.alive = False
+        return snake
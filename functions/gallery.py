@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+
+from functions.snake_board import get_board_apples
+
+# values of the cells in the frame buffer. The cells between the boards are nan, so they are not drawn
+EMPTY = 0
+BODY = 1
+HEAD = 2
+APPLE = 3
+DEAD = 4
+
+
+class GameGallery:
+    """ Replay many games side by side. All boards are drawn in one shared frame buffer, a grid of boards separated by
+        a row and column of nan. The games are decoded from a move log, so they are not played again. Each step only
+        the cells that change are updated, for all games at once:
+            1) the tail is cleared, unless the snake grows
+            2) the old head becomes body
+            3) the apple is drawn
+            4) the new head is drawn
+        When a game ends, the snake is drawn as dead.
+
+    Attributes:
+        grid_size (int): Size of the grid of each board
+        n_games (int): Number of games
+        n_cols (int): Number of boards next to each other
+        frame (np.array): frame buffer with the cells of all boards
+        move (int): Number of moves played
+        scores (np.array): Number of apples found in each game so far
+        n_moves (np.array): Number of moves of each game
+    """
+
+    def __init__(self, games, grid_size=10, apple_seed=2, n_cols=None):
+        """ Initialize gallery
+
+        Args:
+            games (list): games decoded by MoveLog.decode_game
+            grid_size (int): Size of the grid
+            apple_seed (int): Seed of the apples of the board
+            n_cols (int): Number of boards next to each other. When None the boards are arranged in a square
+        """
+        self.grid_size = grid_size
+        self.n_games = len(games)
+        self.n_cols = n_cols or max(1, int(math.ceil(math.sqrt(self.n_games))))
+        n_rows = max(1, int(math.ceil(self.n_games / self.n_cols)))
+        self.apples = get_board_apples(grid_size, apple_seed)
+
+        # positions of the snake; the initial body (tail first) followed by the head before and after each move. Games
+        # that end earlier are padded with their last position
+        center = grid_size // 2
+        self.n_moves = np.asarray([len(game['moves']) for game in games], dtype=int)
+        max_moves = int(self.n_moves.max()) if self.n_games else 0
+        self._positions = np.zeros((self.n_games, max_moves + 3, 2), dtype=int)
+        self._length = np.full((self.n_games, max_moves + 1), 3, dtype=int)
+        self._apple_moves = []
+        for i, game in enumerate(games):
+            n_moves = self.n_moves[i]
+            self._positions[i, :2] = [[center, center - 2], [center, center - 1]]
+            self._positions[i, 2:n_moves + 3] = game['head']
+            self._positions[i, n_moves + 3:] = game['head'][-1]
+            self._length[i, 1:n_moves + 1] = game['length']
+            self._length[i, n_moves + 1:] = self._length[i, n_moves]
+            self._apple_moves.append(np.asarray(game['apple_moves']))
+
+        # top left cell of each board in the frame buffer
+        tiles = np.arange(self.n_games)
+        self._origin = np.stack([tiles // self.n_cols, tiles % self.n_cols], axis=1) * (grid_size + 1)
+
+        self.frame = np.full((n_rows * (grid_size + 1) - 1, self.n_cols * (grid_size + 1) - 1), np.nan,
+                             dtype=np.float32)
+        for origin in self._origin:
+            self.frame[origin[0]:origin[0] + grid_size, origin[1]:origin[1] + grid_size] = EMPTY
+        self.move = 0
+        self.scores = np.zeros(self.n_games, dtype=int)
+
+        games = np.arange(self.n_games)
+        for i in range(2):
+            self._draw(games, self._positions[:, i], BODY)
+        self._draw(games, self.apples[np.zeros(self.n_games, dtype=int)], APPLE)
+        self._draw(games, self._positions[:, 2], HEAD)
+
+    @property
+    def playing(self):
+        """ True while at least one game has moves left """
+        return bool(np.any(self.n_moves > self.move))
+
+    def _draw(self, games, cells, value):
+        """ Set the cells of games to value. Cells outside the board (a snake that hit the wall) are skipped
+
+        Args:
+            games (np.array): index of the game of each cell
+            cells (np.array): n_cells by 2 array with the row and column of each cell on its board
+            value (int): cell value
+        """
+        on_board = np.all((cells >= 0) & (cells < self.grid_size), axis=1)
+        cells = cells[on_board] + self._origin[games[on_board]]
+        self.frame[cells[:, 0], cells[:, 1]] = value
+
+    def step(self):
+        """ Play the next move of all games that have moves left
+
+        Returns:
+            bool: True while at least one game has moves left
+        """
+        if not self.playing:
+            return False
+        self.move += 1
+        move = self.move
+        games = np.flatnonzero(self.n_moves >= move)
+        positions = self._positions[games]
+
+        # the tail is removed, unless the snake grows in this move
+        length_before = self._length[games, move - 1]
+        shrink = self._length[games, move] == length_before
+        self._draw(games[shrink], positions[shrink, move + 2 - length_before[shrink]], EMPTY)
+
+        self._draw(games, positions[:, move + 1], BODY)
+
+        # apple of each game after this move
+        self.scores[games] = [np.searchsorted(self._apple_moves[game], move, side='right') for game in games]
+        self._draw(games, self.apples[np.minimum(self.scores[games], len(self.apples) - 1)], APPLE)
+
+        self._draw(games, positions[:, move + 2], HEAD)
+
+        for game in games[self.n_moves[games] == move]:
+            length = self._length[game, move]
+            self._draw(np.full(length, game), self._positions[game, move + 3 - length:move + 3], DEAD)
+        return self.playing
+
+    def get_tile_centers(self):
+        """ Get the center of each board in the frame buffer, e.g. to show the score of each game
+
+        Returns:
+            np.array: n_games by 2 array with the row and column of the center of each board
+        """
+        return self._origin + (self.grid_size - 1) / 2
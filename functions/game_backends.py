@@ -0,0 +1,167 @@
+import math
+
+import numpy as np
+
+from functions.sampling_profiler import profile_worker
+
+# backends that can be used to let a population play Snake
+BACKENDS = ('serial', 'joblib', 'vectorized')
+
+
+def get_num_cores():
+    """ Determine number of computer cores
+
+    Returns:
+        int: number of computer cores
+    """
+    import multiprocessing
+    return multiprocessing.cpu_count()
+
+
+def play_game(snake):
+    """ Play Snake
+
+    Args:
+        snake (Snake): Snake object. Generated with class Snake()
+
+    Returns:
+        Snake: Snake object which has played a game of Snake
+    """
+    while snake.alive:
+        snake.make_decision()
+        snake.update_snake()
+        snake.found_apple()
+        snake.snake_alive()
+    return snake
+
+
+def play_games_serial(snakes):
+    """ Play Snake with each snake, one game after the other
+
+    Args:
+        snakes (list): List of Snake objects
+
+    Returns:
+        list: List of Snake objects which have played a game of Snake
+    """
+    with profile_worker():
+        return [play_game(snake) for snake in snakes]
+
+
+def play_chunk(snakes):
+    """ Play Snake with each snake of a chunk, one game after the other
+
+    Args:
+        snakes (list): List of Snake objects
+
+    Returns:
+        list: fitness, number of apples found, number of moves played, death cause, moves and apple moves of each
+            snake. The moves and apple moves are None when the snake does not record its moves
+    """
+    return [(snake.fitness, snake.total_apples_found, snake.moves_played, snake.death_cause,
+             None if snake.moves is None else np.asarray(snake.moves, dtype=np.uint8),
+             None if snake.apple_moves is None else np.asarray(snake.apple_moves, dtype=np.int32))
+            for snake in play_games_serial(snakes)]
+
+
+def play_games_joblib(snakes, n_jobs=None, chunk_size=None):
+    """ Play Snake with each snake in parallel processes. The snakes are divided in one chunk per process, so each
+        process receives its snakes at once. Only the results of the games are sent back, the snakes of the population
+        are updated with these results.
+
+    Args:
+        snakes (list): List of Snake objects
+        n_jobs (int): Number of processes. When None all computer cores are used
+        chunk_size (int): Maximum number of games that are in memory of the processes at the same time. The snakes
+            are then divided in more, smaller chunks. When None there is no maximum
+
+    Returns:
+        list: List of Snake objects which have played a game of Snake
+    """
+    # joblib is only needed for this backend
+    from joblib import Parallel, delayed
+
+    n_jobs = n_jobs or get_num_cores()
+    n_chunks = n_jobs
+    if chunk_size is not None:
+        n_chunks = max(n_jobs, int(math.ceil(len(snakes) * n_jobs / chunk_size)))
+    chunks = [snakes[i::n_chunks] for i in range(n_chunks)]
+    results = Parallel(n_jobs=n_jobs, pre_dispatch='n_jobs')(delayed(play_chunk)(chunk) for chunk in chunks if chunk)
+
+    for i, chunk_results in enumerate(results):
+        for snake, (fitness, total_apples_found, moves_played, death_cause, moves, apple_moves) in \
+                zip(snakes[i::n_chunks], chunk_results):
+            snake.fitness = fitness
+            snake.total_apples_found = total_apples_found
+            snake.moves_played = moves_played
+            snake.death_cause = death_cause
+            snake.moves = moves
+            snake.apple_moves = apple_moves
+            snake.alive = False
+    return snakes
+
+
+def play_games_vectorized(snakes, chunk_size=None):
+    """ Play Snake with all snakes at once, see functions.vectorized_snake.play_games_batch
+
+    Args:
+        snakes (list): List of Snake objects, all playing on the same board. The moves are recorded when the first
+            snake records its moves
+        chunk_size (int): Maximum number of games that are played at once. When None all games are played at once
+
+    Returns:
+        list: List of Snake objects which have played a game of Snake
+    """
+    from functions.vectorized_snake import play_games_batch
+
+    if not snakes:
+        return snakes
+    grid_size = snakes[0].grid_size
+    if any(snake.grid_size != grid_size for snake in snakes):
+        raise ValueError("All snakes must play on the same grid size with the vectorized backend")
+
+    from functions.snake import DEATH_CAUSES
+
+    record_moves = snakes[0].moves is not None
+    chunk_size = chunk_size or len(snakes)
+    for start in range(0, len(snakes), chunk_size):
+        chunk = snakes[start:start + chunk_size]
+        dna = np.concatenate([snake.dna for snake in chunk], axis=0)
+        results = play_games_batch(dna, grid_size, snakes[0].apples, record_moves)
+        fitness, total_apples_found, moves_played = results[:3]
+        for snake, snake_fitness, apples_found, moves in zip(chunk, fitness.tolist(), total_apples_found.tolist(),
+                                                             moves_played.tolist()):
+            snake.fitness = snake_fitness
+            snake.total_apples_found = apples_found
+            snake.moves_played = moves
+            snake.alive = False
+        if record_moves:
+            move_log = results[3]
+            for snake, snake_moves, apple_moves, death_cause in zip(chunk, move_log['moves'], move_log['apple_moves'],
+                                                                     move_log['death_cause'].tolist()):
+                snake.moves = snake_moves
+                snake.apple_moves = apple_moves
+                snake.death_cause = DEATH_CAUSES[death_cause]
+    return snakes
+
+
+def play_games(snakes, backend='joblib', n_jobs=None, chunk_size=None):
+    """ Play Snake with each snake
+
+    Args:
+        snakes (list): List of Snake objects
+        backend (str): 'serial', 'joblib' or 'vectorized'
+        n_jobs (int): Number of processes used by the joblib backend. When None all computer cores are used
+        chunk_size (int): Maximum number of games that are in memory at the same time, used to stay within a memory
+            budget. When None there is no maximum. The serial backend plays one game at a time anyway
+
+    Returns:
+        list: List of Snake objects which have played a game of Snake
+    """
+    if backend == 'serial':
+        return play_games_serial(snakes)
+    elif backend == 'joblib':
+        return play_games_joblib(snakes, n_jobs, chunk_size)
+    elif backend == 'vectorized':
+        return play_games_vectorized(snakes, chunk_size)
+    raise ValueError("Backend %s is not supported, choose one of %s" % (backend, ', '.join(BACKENDS)))
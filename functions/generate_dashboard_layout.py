@@ -1,12 +1,15 @@
+import uuid
+
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
 
 
 def generate_layout():
-    """Generate dashboard layout"""
-    return html.Div(children=[dcc.Tabs(
+    """Generate dashboard layout. The layout is generated each time the page is loaded, so each browser session gets
+        its own session id"""
+    session_id = html.Div(id='session_id', children=str(uuid.uuid4()), hidden=True)
+    return html.Div(children=[session_id, dcc.Tabs(
         [dcc.Tab(label="Train AI",
                  children=[html.H1(children="AI learns snake"),
                            html.Div([html.Hr(),
@@ -28,6 +31,15 @@ def generate_layout():
                                                                  type='number',
                                                                  style={"margin": "5px",
                                                                         "width": "100%"}),
+                                                       html.P(children='Grid size:',
+                                                              style={'textAlign': 'left',
+                                                                     'margin': '5px'}),
+                                                       dcc.Input(id='grid_size',
+                                                                 value=10,
+                                                                 type='number',
+                                                                 min=5,
+                                                                 style={"margin": "5px",
+                                                                        "width": "100%"}),
                                                        html.P(children='Survival percentage (%):',
                                                               style={'textAlign': 'left',
                                                                      'margin': '5px'}),
@@ -115,5 +127,44 @@ def generate_layout():
                                                                  hidden=True)])],
                                               width=3),
                                               dbc.Col([dcc.Graph(id='play_snake',
-                                                                 figure=go.Figure(),
+                                                                 figure={},
+                                                                 config={'displayModeBar': False})])])])]),
+         dcc.Tab(label='Gallery',
+                 children=[html.H1(children="Best snakes of a generation"),
+                           html.Div([html.Hr(),
+                                     dbc.Row([dbc.Col([
+                                              html.H3(children='Settings',
+                                                      style={'textAlign': 'left'}),
+                                              html.P(children='Select training moment:',
+                                                     style={'textAlign': 'left',
+                                                            'margin': '5px'}),
+                                              dcc.Dropdown(id='gallery_session_selection'),
+                                              html.P(children='Select generation (trained with --record-moves)',
+                                                     style={'textAlign': 'left',
+                                                            'margin': '5px'}),
+                                              dcc.Dropdown(id='gallery_generation_selection'),
+                                              html.P(children='Number of snakes:',
+                                                     style={'textAlign': 'left',
+                                                            'margin': '5px'}),
+                                              dcc.Input(id='gallery_size',
+                                                        value=16,
+                                                        type='number',
+                                                        min=1,
+                                                        max=100,
+                                                        style={"margin": "5px",
+                                                               "width": "100%"}),
+                                              html.Div([dbc.Button('Play',
+                                                                   id="play_gallery_button",
+                                                                   color="primary",
+                                                                   style={"margin": "5px",
+                                                                          "width": "100%"}),
+                                                        dcc.Interval(id='gallery_interval',
+                                                                     interval=0.1 * 1000,
+                                                                     n_intervals=0),
+                                                        html.Div(id='gallery_location',
+                                                                 children=None,
+                                                                 hidden=True)])],
+                                              width=3),
+                                              dbc.Col([dcc.Graph(id='gallery',
+                                                                 figure={},
                                                                  config={'displayModeBar': False})])])])])])])
@@ -1,23 +1,46 @@
+import math
 import numpy as np
 from operator import attrgetter
 
-import multiprocessing
-from joblib import Parallel, delayed
-
 from functions.snake import Snake
+from functions import game_backends
+from functions.genome_file import get_n_genes, get_topology, write_genomes
+from functions.move_log import write_snake_moves
+from functions.optimizer import Optimizer
+from functions.random_streams import draw_children, get_seed, random_dna
+
 
-# determine number of computer cores
-num_cores = multiprocessing.cpu_count()
+def get_min_population_size(survival_perc, parent_perc):
+    """ Get the smallest population size that has at least one parent and, when snakes survive, one survivor
 
+    Args:
+        survival_perc (float): Survival percentages. Value between 0 and 1
+        parent_perc (float): Parent percentages. Value between 0 and 1
 
-class GeneticAlgorithm:
+    Returns:
+        int: minimum population size
+    """
+    if parent_perc <= 0:
+        raise ValueError("Parent percentage must be above 0, each child needs a parent")
+    population_size = 2
+    for perc in (survival_perc, parent_perc):
+        if perc > 0:
+            # int() of the rounded up inverse can still be 0 due to floating point errors
+            size = int(math.ceil(1 / perc))
+            while int(size * perc) < 1:
+                size += 1
+            population_size = max(population_size, size)
+    return population_size
+
+
+class GeneticAlgorithm(Optimizer):
     """
     Genetics algorithm for playing Snake. The genetic algorithm exists out of the following steps:
         1) Generate population, which is called a generation
         2) Play game
         3) Selected fittest snakes that will survive and will be part of the next generation
         4) Determine parents
-        5) Generate children. These children will be based on the DNA of their parents (crossover) and random mutations
+        5) Generate children. Each child is a copy of the DNA of a random parent with random mutations
         6) Generate new population. New population will be based on the newly generated children and survivors
         7) repeat steps 2 till 6
 
@@ -26,10 +49,19 @@ class GeneticAlgorithm:
         survival_perc (float): Survival percentages. Value between 0 and 1
         mutation_rate (float): Mutation percentages. Value between 0 and 1
         parent_perc (float): Parent percentages. Value between 0 and 1
+        grid_size (int): Size of the grid the snakes play on
+        backend (str): Backend used to play the games; 'serial', 'joblib' or 'vectorized'
+        n_jobs (int): Number of processes used by the joblib backend. When None all computer cores are used
+        record_moves (bool): When True the snakes record their moves, so they can be saved with save_move_log
+        seed (int): Seed of the random numbers, see functions.random_streams
+        generation (int): Generation of the population, the random numbers of each generation are different
         population (list): List of snake objects. Contains all the snakes in the population
     """
 
-    def __init__(self, population_size, survival_perc, parent_perc, mutation_rate):
+    supports_move_logs = True
+
+    def __init__(self, population_size, survival_perc, parent_perc, mutation_rate, grid_size=10, backend='joblib',
+                 n_jobs=None, record_moves=False, seed=None):
         """ Initialize object
 
         Args:
@@ -37,15 +69,43 @@ class GeneticAlgorithm:
             survival_perc (float): Survival percentages. Value between 0 and 1
             parent_perc (float): Parent percentages. Value between 0 and 1
             mutation_rate (float): Mutation percentages. Value between 0 and 1
+            grid_size (int): Size of the grid the snakes play on
+            backend (str): Backend used to play the games; 'serial', 'joblib' or 'vectorized'
+            n_jobs (int): Number of processes used by the joblib backend. When None all computer cores are used
+            record_moves (bool): When True the snakes record their moves, so they can be saved with save_move_log
+            seed (int): Seed of the random numbers. When None a new seed is generated
         """
+        if backend not in game_backends.BACKENDS:
+            raise ValueError("Backend %s is not supported, choose one of %s" %
+                             (backend, ', '.join(game_backends.BACKENDS)))
+
         self.population_size = population_size
         self.survival_perc = survival_perc
         self.mutation_rate = mutation_rate
         self.parent_perc = parent_perc
+        self.grid_size = grid_size
+        self.backend = backend
+        self.n_jobs = n_jobs
+        self.record_moves = record_moves
+        self.seed = get_seed(seed)
+        self.generation = 0
 
         self.population = None
         self.generate_population()
 
+    @classmethod
+    def from_settings(cls, population_size, output_folder, settings):
+        return cls(population_size, settings['survival_perc'], settings['parent_perc'], settings['mutation_rate'],
+                   grid_size=settings['grid_size'], backend=settings['backend'], n_jobs=settings['n_jobs'],
+                   record_moves=settings['record_moves'], seed=settings['seed'])
+
+    @classmethod
+    def get_min_population_size(cls, settings):
+        return get_min_population_size(settings['survival_perc'], settings['parent_perc'])
+
+    def __len__(self):
+        return len(self.population)
+
     def generate_population(self):
         """ Generate population
 
@@ -54,15 +114,21 @@ class GeneticAlgorithm:
         """
         # initialize population
         if self.population is None:
-            self.population = [Snake() for _ in range(self.population_size)]
+            dna = random_dna(self.seed, 0, self.population_size, get_n_genes(get_topology()), self.generation)
+            self.population = [Snake(self.grid_size, dna=snake_dna) for snake_dna in dna]
         else:
+            self.generation += 1
+
             # Determine fittest snakes
             survivors = self.survival_of_the_fittest()
 
             # Determine which snakes may be parents
             parents = self.select_parents()
 
-            # Generate children based on crossover and mutations
+            # release the snakes that are not selected, so the old and new population are not in memory together
+            self.population = None
+
+            # Generate children based on parents and mutations
             children = self.generate_children(parents)
 
             # reset parameters of snakes. So that they can play the game again
@@ -72,67 +138,77 @@ class GeneticAlgorithm:
             # Create new population. Survivors + children
             self.population = survivors + children
 
-    def play_games(self, parallel=True):
-        """ Play Snake with each snake in population
+    def load_population(self, dna, generation=0):
+        """ Replace population by new snakes with the given DNA. The population size is not changed: a population
+            generated by generate_population has the survivors and population_size - n_parents children, so the
+            number of snakes in a checkpoint is not the population size
 
         Args:
-            parallel (bool): When True the games are played in parallel. Otherwise the games are played in serie
+            dna (np.array): n_snakes by n_genes array with the DNA of each snake
+            generation (int): generation of the population
         """
-        if parallel:
-            self.population = Parallel(n_jobs=num_cores)(delayed(self.play_game)(snake) for snake in self.population)
-        else:
-            for snake in self.population:
-                self.play_game(snake)
-
-    @staticmethod
-    def play_game(snake):
-        """ Play Snake
+        self.population = [Snake(self.grid_size, dna=snake_dna) for snake_dna in np.asarray(dna, dtype=np.float64)]
+        self.generation = generation
 
-        Args:
-            snake (Snake): Snake object. Generated with class Snake()
+    def get_population_dna(self):
+        """ Get DNA of the entire population
 
         Returns:
-            Snake: Snake object which has played a game of Snake
+            np.array: population_size by n_genes array with the DNA of each snake
         """
-        while snake.alive:
-            snake.make_decision()
-            snake.update_snake()
-            snake.found_apple()
-            snake.snake_alive()
-        return snake
+        return np.concatenate([snake.dna for snake in self.population], axis=0)
 
-    def get_population_fitness(self):
-        """ Get mean fitness of entire population
+    def save_population(self, path, generation):
+        """ Save DNA of the entire population to a genome file
 
-        Returns:
-            float: Mean population fitness
+        Args:
+            path (str): path to genome file
+            generation (int): generation of the population
         """
-        return np.mean([snake.fitness for snake in self.population])
+        write_genomes(path, self.get_population_dna(), grid_size=self.grid_size, generation=generation)
 
-    def get_population_score(self):
-        """ Get mean population score (number of apples eaten)
+    def save_move_log(self, path, generation):
+        """ Save the moves of the games of the entire population to a move log file, see functions.move_log
 
-        Returns:
-            float: Mean population score
+        Args:
+            path (str): path to move log file
+            generation (int): generation of the population
         """
-        return np.mean([snake.total_apples_found for snake in self.population])
+        write_snake_moves(path, self.population, generation)
 
-    def get_best_fitness(self):
-        """ Get fitness of best snake in population
+    def play_games(self, parallel=True, chunk_size=None):
+        """ Play Snake with each snake in population
 
-        Returns:
-            float: Fitness of best snake
+        Args:
+            parallel (bool): When True the games are played with the backend of the genetic algorithm. Otherwise the
+                games are played in serie
+            chunk_size (int): Maximum number of games that are in memory at the same time. When None there is no
+                maximum
         """
-        return np.max([snake.fitness for snake in self.population])
+        backend = self.backend if parallel else 'serial'
+        if self.record_moves:
+            for snake in self.population:
+                if snake.moves is None:
+                    snake.start_recording()
+        self.population = game_backends.play_games(self.population, backend, self.n_jobs, chunk_size)
 
-    def get_best_score(self):
-        """ Get score of best snake in population
+    @staticmethod
+    def play_game(snake):
+        """ Play Snake
 
-        Returns:
-            float: Score of best snake
+        Args:
+            snake (Snake): Snake object. Generated with class Snake()
 
+        Returns:
+            Snake: Snake object which has played a game of Snake
         """
-        return np.max([snake.total_apples_found for snake in self.population])
+        return game_backends.play_game(snake)
+
+    def get_fitness(self):
+        return np.asarray([snake.fitness for snake in self.population])
+
+    def get_scores(self):
+        return np.asarray([snake.total_apples_found for snake in self.population])
 
     def get_best_snake(self):
         """ Get best snake in population
@@ -164,59 +240,34 @@ class GeneticAlgorithm:
         parents = sorted_population[:n_parents]
         return parents
 
-    def generate_children(self, survivors):
-        """ Generate children based on a crossover of DNA between parents and mutations that could occur
+    def generate_children(self, parents):
+        """ Generate children. Each child is a copy of the DNA of a random parent with mutations that could occur.
+            There is no crossover between two parents, see the README
 
         Args:
-            survivors (list): List of Snake objects
+            parents (list): List of Snake objects
 
         Returns:
             list: List of Snake object
         """
-        n_new_children = self.population_size - len(survivors)
-        soulmates = np.random.choice(len(survivors), size=(n_new_children, 2))
-        soulmates = [(survivors[parent1], survivors[parent1]) for parent1, parent2 in soulmates]
-        children = [self.crossover(parent1, parent2) for parent1, parent2 in soulmates]
-        children = [self.mutation(child) for child in children]
+        n_new_children = self.population_size - len(parents)
+        parent_indices, mutations = draw_children(self.seed, self.generation, 0, n_new_children, len(parents),
+                                                  parents[0].n_genes, self.mutation_rate)
+        children = [self.mutation(Snake(self.grid_size, dna=parents[parent].dna), mutation)
+                    for parent, mutation in zip(parent_indices.tolist(), mutations)]
         return children
 
     @staticmethod
-    def crossover(parent1, parent2):
-        """ Single point binary crossover between parent 1 and parent 2.
-
-        Args:
-            parent1 (Snake): Parent 1
-            parent2 (Snake): Parent 2
-
-        Returns:
-            Snake: Snake with DNA based on parent 1 and 2
-        """
-        dna_parent1 = parent1.dna.reshape(-1)
-        dna_parent2 = parent2.dna.reshape(-1)
-
-        random_position = np.random.choice(dna_parent1.shape[0])
-        dna_child = np.concatenate([dna_parent1[:random_position], dna_parent2[random_position:]])
-
-        snake_child = Snake()
-        snake_child.dna = np.asarray(dna_child).reshape(1, -1)
-        return snake_child
-
-    def mutation(self, snake):
+    def mutation(snake, mutation):
         """ Apply random mutation on DNA of snake
 
         Args:
             snake (Snake): Snake object to alter DNA for
+            mutation (np.array): Value added to each gene. A value from a gaussian distribution (mean=0, std=0.5) for
+                the genes that are altered, otherwise 0. See functions.random_streams.draw_children
 
         Returns:
             Snake: Snake with altered DNA
         """
-        # determine which gene is going to be altered
-        random_values = np.random.rand(*snake.dna.shape).reshape(-1)
-        random_values = random_values <= self.mutation_rate
-
-        # add random value picked from gaussian distribution (mean=0, std=0.5) to gene
-        dna = snake.dna.reshape(-1)
-        mutated_dna = [gene + np.random.normal(scale=0.5) if random_value else gene
-                       for gene, random_value in zip(dna, random_values)]
-        snake.dna = np.asarray(mutated_dna).reshape(1, -1)
+        snake.dna = (snake.dna.reshape(-1) + mutation).reshape(1, -1)
         return snake
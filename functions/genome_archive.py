@@ -0,0 +1,269 @@
+import os
+import struct
+import time
+
+import numpy as np
+
+from functions.genome_file import GENOME_DTYPE, VALUE_DTYPES, get_n_genes, get_topology, snake_from_dna
+
+# file layout: fixed size header, DNA blocks (one per genome) and an index at the end of the file. The index is
+# rewritten after each appended genome and the header is updated last. The header has a sequence number that is odd
+# while the index is rewritten, readers check it before and after reading the index. The DNA values are stored as
+# float64 (see GENOME_DTYPE), version 1 archives store float32 values.
+ARCHIVE_MAGIC = b'SNKA'
+ARCHIVE_VERSION = 2
+ARCHIVE_FILE_NAME = 'hall_of_fame.archive'
+
+# magic, version, header size, n_input, n_hidden_1, n_hidden_2, n_output, grid size, apple seed, number of genomes,
+# index offset, size of a DNA value in bytes, sequence number
+_HEADER_STRUCT = struct.Struct('<4sHHHHHHHiIQHQ')
+HEADER_SIZE = 64
+
+INDEX_DTYPE = np.dtype([('generation', '<i4'),
+                        ('score', '<i4'),
+                        ('fitness', '<f8'),
+                        ('offset', '<u8')])
+
+
+class GenomeArchive:
+    """ Archive with the best genome of each generation of a training session. All genomes are stored in a single
+        file together with a small index, so genomes can be looked up by generation or score without scanning
+        directories.
+
+    Attributes:
+        path (str): path to archive file
+        topology (tuple): topology of the brains in the archive
+        n_genes (int): number of genes of each genome
+        grid_size (int): size of the board the genomes are trained on
+        apple_seed (int): seed used to generate the apples of the board
+        index (np.array): structured array with for each genome the generation, score, fitness and offset in the file
+        dtype (np.dtype): dtype of the DNA values in the file
+        mode (str): 'r' when the archive is opened read only, 'a' when genomes can be appended
+    """
+
+    def __init__(self, path, grid_size=10, apple_seed=2, topology=None, mode='a'):
+        """ Open archive
+
+        Args:
+            path (str): path to archive file
+            grid_size (int): size of the board, only used when a new archive is created
+            apple_seed (int): seed used to generate the apples, only used when a new archive is created
+            topology (tuple): topology of the brain, only used when a new archive is created
+            mode (str): 'r' to only read an existing archive, FileNotFoundError is raised when the file does not exist.
+                'a' to read and append, a new archive is created when the file does not exist
+        """
+        if mode not in ('r', 'a'):
+            raise ValueError("Mode %s is not supported, use 'r' or 'a'" % mode)
+        if mode == 'r' and not os.path.exists(path):
+            raise FileNotFoundError("Genome archive %s does not exist" % path)
+
+        self.path = path
+        self.mode = mode
+        self.topology = topology or get_topology()
+        self.grid_size = grid_size
+        self.apple_seed = apple_seed
+        self.dtype = GENOME_DTYPE
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._index_offset = HEADER_SIZE
+        self._sequence = 0
+        self._rows = {}
+
+        if os.path.exists(path):
+            self.refresh()
+        else:
+            self.n_genes = get_n_genes(self.topology)
+            with open(path, 'wb') as file:
+                file.write(self._pack_header())
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, generation):
+        return int(generation) in self._rows
+
+    def _pack_header(self):
+        header = _HEADER_STRUCT.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, HEADER_SIZE, *self.topology, self.grid_size,
+                                     self.apple_seed, len(self.index), self._index_offset, self.dtype.itemsize,
+                                     self._sequence)
+        return header.ljust(HEADER_SIZE, b'\0')
+
+    def _read_header(self, file):
+        file.seek(0)
+        raw = file.read(HEADER_SIZE)
+        if len(raw) < _HEADER_STRUCT.size:
+            raise ValueError("File %s is too small to be a genome archive" % self.path)
+        magic, version, _, n_input, n_hidden_1, n_hidden_2, n_output, grid_size, apple_seed, n_genomes, \
+            index_offset, value_size, sequence = _HEADER_STRUCT.unpack_from(raw)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError("File %s is not a genome archive" % self.path)
+        if version > ARCHIVE_VERSION:
+            raise ValueError("Archive version %i is not supported (max version %i)" % (version, ARCHIVE_VERSION))
+        if value_size not in VALUE_DTYPES:
+            raise ValueError("DNA values of %i bytes in archive %s are not supported" % (value_size, self.path))
+        return (n_input, n_hidden_1, n_hidden_2, n_output), grid_size, apple_seed, n_genomes, index_offset, \
+            VALUE_DTYPES[value_size], sequence
+
+    def refresh(self, max_retries=10):
+        """ (Re)read header and index from file. The index may be rewritten by a training session while it is read,
+            in that case the sequence number is odd or has changed after reading and the index is read again.
+
+        Args:
+            max_retries (int): maximum number of times the index is read again
+        """
+        with open(self.path, 'rb') as file:
+            for _ in range(max_retries):
+                header = self._read_header(file)
+                _, _, _, n_genomes, index_offset, _, sequence = header
+                if sequence % 2:
+                    time.sleep(0.01)
+                    continue
+                file.seek(index_offset)
+                index = np.frombuffer(file.read(n_genomes * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+                if self._read_header(file) == header and len(index) == n_genomes:
+                    break
+            else:
+                raise IOError("Index of archive %s keeps changing while reading it" % self.path)
+
+        self.topology, self.grid_size, self.apple_seed, _, self._index_offset, self.dtype, self._sequence = header
+        self.n_genes = get_n_genes(self.topology)
+        self.index = index.copy()
+        self._rows = {int(generation): row for row, generation in enumerate(self.index['generation'])}
+
+    def append(self, dna, generation, score, fitness):
+        """ Append genome to archive
+
+        Args:
+            dna (np.array): DNA values of the genome
+            generation (int): generation of the genome
+            score (int): score of the genome
+            fitness (float): fitness of the genome
+        """
+        if self.mode == 'r':
+            raise ValueError("Archive %s is opened read only" % self.path)
+        dna = np.asarray(dna, dtype=self.dtype).reshape(-1)
+        if dna.shape[0] != self.n_genes:
+            raise ValueError("Genome has %i genes, archive expects %i genes" % (dna.shape[0], self.n_genes))
+
+        entry = np.array([(generation, score, fitness, self._index_offset)], dtype=INDEX_DTYPE)
+        index = np.concatenate([self.index, entry])
+        index_offset = self._index_offset + dna.nbytes
+
+        with open(self.path, 'r+b') as file:
+            # an odd sequence number tells readers that the index is being rewritten
+            self._sequence += 1
+            file.write(self._pack_header())
+            file.flush()
+
+            # DNA overwrites the old index, the new index is written directly after the DNA
+            file.seek(self._index_offset)
+            file.write(dna.tobytes())
+            file.write(index.tobytes())
+            file.truncate()
+            file.flush()
+
+            self.index = index
+            self._index_offset = index_offset
+            self._rows[int(generation)] = len(index) - 1
+            self._sequence += 1
+            file.seek(0)
+            file.write(self._pack_header())
+
+    def truncate(self, generation):
+        """ Remove the genomes of the generations after a generation, e.g. when training is resumed from a checkpoint
+            of that generation and the later generations are trained again
+
+        Args:
+            generation (int): last generation that is kept
+        """
+        if self.mode == 'r':
+            raise ValueError("Archive %s is opened read only" % self.path)
+        keep = self.index['generation'] <= generation
+        if keep.all():
+            return
+        index = self.index[keep]
+
+        # the space of the removed genomes is reused when they are the last genomes in the file
+        index_offset = self._index_offset
+        if not keep[np.argmin(keep):].any():
+            index_offset = int(self.index['offset'][~keep].min())
+
+        with open(self.path, 'r+b') as file:
+            self._sequence += 1
+            file.write(self._pack_header())
+            file.flush()
+
+            file.seek(index_offset)
+            file.write(index.tobytes())
+            file.truncate()
+            file.flush()
+
+            self.index = index
+            self._index_offset = index_offset
+            self._rows = {int(generation): row for row, generation in enumerate(self.index['generation'])}
+            self._sequence += 1
+            file.seek(0)
+            file.write(self._pack_header())
+
+    def generations(self):
+        """ Get generations in archive
+
+        Returns:
+            np.array: generations in order of appending
+        """
+        return self.index['generation'].copy()
+
+    def get_record(self, generation):
+        """ Get index record of a generation
+
+        Args:
+            generation (int): generation
+
+        Returns:
+            np.void: record with generation, score, fitness and offset
+        """
+        try:
+            return self.index[self._rows[int(generation)]]
+        except KeyError:
+            raise KeyError("Generation %s is not in archive %s" % (generation, self.path))
+
+    def get_dna(self, generation):
+        """ Get DNA of a generation. The DNA values are memory mapped, no copy is made.
+
+        Args:
+            generation (int): generation
+
+        Returns:
+            np.array: memory mapped DNA values
+        """
+        record = self.get_record(generation)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=int(record['offset']),
+                         shape=(self.n_genes,))
+
+    def get_snake(self, generation):
+        """ Create new snake with the DNA of a generation
+
+        Args:
+            generation (int): generation
+
+        Returns:
+            Snake: new snake
+        """
+        if self.topology != get_topology():
+            raise ValueError("Topology %s of archive %s does not match the brain topology %s" %
+                             (self.topology, self.path, get_topology()))
+        return snake_from_dna(self.get_dna(generation), self.grid_size)
+
+    def top(self, n, key='score'):
+        """ Get index records of the n best genomes
+
+        Args:
+            n (int): number of genomes
+            key (str): 'score' or 'fitness'
+
+        Returns:
+            np.array: index records sorted from best to worst
+        """
+        if key not in ('score', 'fitness'):
+            raise ValueError("Key %s is not supported" % key)
+        order = np.argsort(-self.index[key], kind='stable')
+        return self.index[order[:n]]
@@ -0,0 +1,225 @@
+import os
+import struct
+
+import numpy as np
+
+from functions.brain import Brain
+
+# file layout: fixed size header followed by raw little-endian DNA values (n_genomes by n_genes). The DNA values are
+# stored as float64, the precision of the brain, so a loaded genome plays exactly as during training. Version 1 files
+# store float32 values, snakes loaded from these files may play slightly different games
+GENOME_FILE_MAGIC = b'SNKG'
+GENOME_FILE_VERSION = 2
+GENOME_FILE_EXTENSION = '.genome'
+GENOME_DTYPE = np.dtype('<f8')
+
+# dtype of the DNA values by the size of a value in the header. The size is 0 in version 1 files
+VALUE_DTYPES = {0: np.dtype('<f4'), 4: np.dtype('<f4'), 8: np.dtype('<f8')}
+
+# magic, version, header size, n_input, n_hidden_1, n_hidden_2, n_output, grid size, apple seed, number of genomes,
+# generation, score, fitness, size of a DNA value in bytes
+_HEADER_STRUCT = struct.Struct('<4sHHHHHHHiIiidH')
+HEADER_SIZE = 64
+
+
+def get_topology(brain=None):
+    """ Get the topology of a (default) brain
+
+    Args:
+        brain (Brain): Brain to get the topology from. When None the topology of a default brain is returned
+
+    Returns:
+        tuple: number of input values, neurons in first and second hidden layer and output values
+    """
+    if brain is None:
+        brain = Brain()
+    return brain.n_input, brain.n_hidden_1, brain.n_hidden_2, brain.n_output
+
+
+def get_n_genes(topology):
+    """ Get number of genes in the dna of a brain with the given topology
+
+    Args:
+        topology (tuple): number of input values, neurons in first and second hidden layer and output values
+
+    Returns:
+        int: number of genes
+    """
+    n_input, n_hidden_1, n_hidden_2, n_output = topology
+    n_weights = n_input*n_hidden_1 + n_hidden_1*n_hidden_2 + n_hidden_2*n_output
+    n_bias = n_hidden_1 + n_hidden_2 + n_output
+    return n_weights + n_bias
+
+
+def pack_header(topology, n_genomes, grid_size=10, apple_seed=2, generation=-1, score=-1, fitness=float('nan')):
+    """ Pack genome file header
+
+    Returns:
+        bytes: header of HEADER_SIZE bytes
+    """
+    header = _HEADER_STRUCT.pack(GENOME_FILE_MAGIC, GENOME_FILE_VERSION, HEADER_SIZE, *topology, grid_size,
+                                 apple_seed, n_genomes, generation, score, fitness, GENOME_DTYPE.itemsize)
+    return header.ljust(HEADER_SIZE, b'\0')
+
+
+def read_header(path):
+    """ Read header of genome file
+
+    Args:
+        path (str): path to genome file
+
+    Returns:
+        dict: header values
+    """
+    with open(path, 'rb') as file:
+        raw = file.read(HEADER_SIZE)
+    if len(raw) < _HEADER_STRUCT.size:
+        raise ValueError("File %s is too small to be a genome file" % path)
+
+    magic, version, header_size, n_input, n_hidden_1, n_hidden_2, n_output, grid_size, apple_seed, n_genomes, \
+        generation, score, fitness, value_size = _HEADER_STRUCT.unpack_from(raw)
+    if magic != GENOME_FILE_MAGIC:
+        raise ValueError("File %s is not a genome file" % path)
+    if version > GENOME_FILE_VERSION:
+        raise ValueError("Genome file version %i is not supported (max version %i)" % (version, GENOME_FILE_VERSION))
+    if value_size not in VALUE_DTYPES:
+        raise ValueError("DNA values of %i bytes in genome file %s are not supported" % (value_size, path))
+
+    topology = (n_input, n_hidden_1, n_hidden_2, n_output)
+    return {'version': version,
+            'header_size': header_size,
+            'topology': topology,
+            'n_genes': get_n_genes(topology),
+            'grid_size': grid_size,
+            'apple_seed': apple_seed,
+            'n_genomes': n_genomes,
+            'generation': generation,
+            'score': score,
+            'fitness': fitness,
+            'dtype': VALUE_DTYPES[value_size]}
+
+
+def write_genomes(path, dna, grid_size=10, apple_seed=2, generation=-1, score=-1, fitness=float('nan'),
+                  topology=None):
+    """ Write one or more genomes to a genome file. The file is first written to a temporary file and then moved,
+        so readers never see a half written file.
+
+    Args:
+        path (str): path to genome file
+        dna (np.array): DNA values. Array of n_genomes by n_genes (a single genome may be 1 dimensional)
+        grid_size (int): size of the board the genomes are trained on
+        apple_seed (int): seed used to generate the apples of the board
+        generation (int): generation of the genome, -1 if unknown
+        score (int): score of the genome, -1 if unknown
+        fitness (float): fitness of the genome, nan if unknown
+        topology (tuple): topology of the brain. When None the topology of the default brain is used
+    """
+    topology = topology or get_topology()
+    dna = np.asarray(dna, dtype=GENOME_DTYPE).reshape(-1, get_n_genes(topology))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(pack_header(topology, dna.shape[0], grid_size, apple_seed, generation, score, fitness))
+        file.write(dna.tobytes())
+    os.replace(tmp_path, path)
+
+
+def create_genome_file(path, n_genomes, grid_size=10, apple_seed=2, generation=-1, topology=None):
+    """ Create genome file with room for n_genomes genomes. The DNA values are not initialized, they can be written
+        with map_genomes.
+
+    Args:
+        path (str): path to genome file
+        n_genomes (int): number of genomes
+        grid_size (int): size of the board the genomes are trained on
+        apple_seed (int): seed used to generate the apples of the board
+        generation (int): generation of the genomes, -1 if unknown
+        topology (tuple): topology of the brain. When None the topology of the default brain is used
+    """
+    topology = topology or get_topology()
+    with open(path, 'wb') as file:
+        file.write(pack_header(topology, n_genomes, grid_size, apple_seed, generation))
+        file.truncate(HEADER_SIZE + n_genomes * get_n_genes(topology) * GENOME_DTYPE.itemsize)
+
+
+def map_genomes(path, start, stop, mode='r', header=None):
+    """ Memory map a range of genomes of a genome file. Only the pages of this range are mapped, so the memory that
+        is used is bounded by the size of the range.
+
+    Args:
+        path (str): path to genome file
+        start (int): index of first genome
+        stop (int): index after the last genome
+        mode (str): memory map mode, 'r' for read only, 'r+' for read and write
+        header (dict): header of the genome file. When None the header is read from the file
+
+    Returns:
+        np.array: memory mapped DNA values (stop - start by n_genes)
+    """
+    header = header or read_header(path)
+    offset = header['header_size'] + start * header['n_genes'] * header['dtype'].itemsize
+    return np.memmap(path, dtype=header['dtype'], mode=mode, offset=offset, shape=(stop - start, header['n_genes']))
+
+
+def load_genomes(path, mode='r'):
+    """ Memory map the genomes of a genome file. No copy of the DNA values is made.
+
+    Args:
+        path (str): path to genome file
+        mode (str): memory map mode, 'r' for read only, 'r+' for read and write
+
+    Returns:
+        tuple: header (dict) and memory mapped DNA values (n_genomes by n_genes)
+    """
+    header = read_header(path)
+    if header['n_genomes'] == 0:
+        return header, np.zeros((0, header['n_genes']), dtype=header['dtype'])
+    dna = np.memmap(path, dtype=header['dtype'], mode=mode, offset=header['header_size'],
+                    shape=(header['n_genomes'], header['n_genes']))
+    return header, dna
+
+
+def snake_from_dna(dna, grid_size=10):
+    """ Create a new snake with the given DNA
+
+    Args:
+        dna (np.array): DNA values of a single genome
+        grid_size (int): size of the board
+
+    Returns:
+        Snake: new snake
+    """
+    # imported here, so reading genome files does not require the game itself
+    from functions.snake import Snake
+
+    return Snake(grid_size, dna=dna)
+
+
+def save_snake(path, snake, generation=-1):
+    """ Save DNA of a snake to a genome file
+
+    Args:
+        path (str): path to genome file
+        snake (Snake): snake to save
+        generation (int): generation of the snake
+    """
+    write_genomes(path, snake.dna, grid_size=snake.grid_size, generation=generation,
+                  score=snake.total_apples_found, fitness=snake.fitness, topology=get_topology(snake))
+
+
+def load_snake(path):
+    """ Load a snake from a genome file that contains a single genome
+
+    Args:
+        path (str): path to genome file
+
+    Returns:
+        Snake: new snake with the DNA of the genome file
+    """
+    header, dna = load_genomes(path)
+    if header['n_genomes'] != 1:
+        raise ValueError("Genome file %s contains %i genomes, expected 1" % (path, header['n_genomes']))
+    if header['topology'] != get_topology():
+        raise ValueError("Topology %s of genome file %s does not match the brain topology %s" %
+                         (header['topology'], path, get_topology()))
+    return snake_from_dna(dna[0], header['grid_size'])
@@ -0,0 +1,238 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from functions.game_backends import get_num_cores
+from functions.sampling_profiler import profile_worker
+from default import file_name_intermediate_results
+
+# parameters of the genetic algorithm that can be part of a sweep
+SWEEP_PARAMETERS = ('population_size', 'survival_perc', 'parent_perc', 'mutation_perc')
+
+# file name of csv file used for storing the comparison of all trials
+file_name_sweep_results = "sweep_results.csv"
+
+
+def generate_grid(space):
+    """ Generate all combinations of parameter values
+
+    Args:
+        space (dict): for each parameter a list of values
+
+    Returns:
+        list: list of dicts, each containing a value for each parameter
+    """
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*[space[name] for name in names])]
+
+
+def generate_random(space, n_trials, seed=None):
+    """ Generate random combinations of parameter values
+
+    Args:
+        space (dict): for each parameter a list of values to choose from or a dict with 'low' and 'high' to sample a
+            value uniformly from. When low and high are integers an integer is sampled
+        n_trials (int): number of combinations
+        seed (int): seed of the random generator
+
+    Returns:
+        list: list of dicts, each containing a value for each parameter
+    """
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, dict):
+                if isinstance(values['low'], int) and isinstance(values['high'], int):
+                    params[name] = int(rng.integers(values['low'], values['high'], endpoint=True))
+                else:
+                    params[name] = float(rng.uniform(values['low'], values['high']))
+            else:
+                params[name] = values[int(rng.integers(len(values)))]
+        trials.append(params)
+    return trials
+
+
+def get_rung_budgets(min_generations, max_generations, eta):
+    """ Get number of generations of each rung of successive halving
+
+    Args:
+        min_generations (int): number of generations of the first rung
+        max_generations (int): number of generations of the last rung
+        eta (int): reduction factor. After each rung 1/eta of the trials continue and the number of generations is
+            multiplied by eta
+
+    Returns:
+        list: number of generations of each rung
+    """
+    budgets = []
+    budget = min_generations
+    while budget < max_generations:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(max_generations)
+    return budgets
+
+
+def read_trial_results(trial_folder):
+    """ Read results of a trial from its intermediate results
+
+    Args:
+        trial_folder (str): output folder of the trial
+
+    Returns:
+        dict: number of generations played, best score, best fitness and population score of the last generation
+    """
+    # a single generation is read as a 0-d array
+    results = np.atleast_1d(np.genfromtxt(os.path.join(trial_folder, file_name_intermediate_results), delimiter=',',
+                                          names=True))
+    return {'generations': int(results['generation'][-1]),
+            'best_score': float(np.max(results['best_score'])),
+            'best_fitness': float(np.max(results['best_fitness'])),
+            'population_score': float(results['population_score'][-1])}
+
+
+def run_trial(trial_folder, n_generations, params, settings):
+    """ Train a trial up to n_generations. Training continues from the checkpoint of the previous rung
+
+    Args:
+        trial_folder (str): output folder of the trial
+        n_generations (int): total number of generations of the trial after this rung
+        params (dict): parameters of the genetic algorithm
+        settings (dict): other arguments of start_genetic_algorithm, e.g. grid_size, backend and n_jobs
+
+    Returns:
+        dict: results of the trial
+    """
+    from functions.train_ai import start_genetic_algorithm
+
+    if not os.path.isdir(trial_folder):
+        os.makedirs(trial_folder)
+    with profile_worker():
+        population = start_genetic_algorithm(trial_folder, n_generations, params['population_size'],
+                                             params['survival_perc'], params['parent_perc'], params['mutation_perc'],
+                                             checkpoint_every=n_generations, resume=True, **settings)
+
+    # each rung resumes the trial, the population must not change size between rungs
+    if not settings.get('adapt_population') and population.population_size != params['population_size']:
+        raise RuntimeError("Population size of trial %s changed from %i to %i" %
+                           (trial_folder, params['population_size'], population.population_size))
+    return read_trial_results(trial_folder)
+
+
+class HyperparameterSweep:
+    """ Sweep over parameters of the genetic algorithm with successive halving. All trials are trained for a small
+        number of generations, only the best 1/eta trials continue to the next rung, which has eta times more
+        generations. Trials of a rung are trained in parallel processes.
+
+    Attributes:
+        output_folder (str): folder with a sub folder for each trial and the comparison table
+        trials (list): list of dicts with a value for each parameter in SWEEP_PARAMETERS for each trial
+        min_generations (int): number of generations of the first rung
+        max_generations (int): number of generations of the last rung
+        eta (int): reduction factor of successive halving
+        metric (str): result used to rank the trials; 'best_score', 'best_fitness' or 'population_score'
+        settings (dict): other arguments of start_genetic_algorithm, e.g. grid_size and backend
+        n_workers (int): number of trials that are trained at the same time
+        results (dict): latest results of each trial by trial id
+    """
+
+    def __init__(self, output_folder, trials, min_generations=10, max_generations=100, eta=3, metric='best_score',
+                 settings=None, n_workers=None):
+        for params in trials:
+            if set(params) != set(SWEEP_PARAMETERS):
+                raise ValueError("Each trial needs exactly the parameters %s, got %s" %
+                                 (', '.join(SWEEP_PARAMETERS), ', '.join(sorted(params))))
+        if metric not in ('best_score', 'best_fitness', 'population_score'):
+            raise ValueError("Metric %s is not supported" % metric)
+
+        self.output_folder = output_folder
+        self.trials = trials
+        self.min_generations = min_generations
+        self.max_generations = max_generations
+        self.eta = eta
+        self.metric = metric
+        self.settings = dict(settings or {})
+        self.n_workers = n_workers
+        self.results = {}
+
+    def get_trial_id(self, i_trial):
+        """ Get id of a trial, which is also the name of its output folder"""
+        return 'trial-%03i' % i_trial
+
+    def run_rung(self, trial_ids, n_generations):
+        """ Train trials up to n_generations in parallel. The computer cores are divided fairly over the trials that
+            are trained at the same time; each trial gets at least one core.
+
+        Args:
+            trial_ids (list): ids of the trials to train
+            n_generations (int): total number of generations of the trials after this rung
+        """
+        n_cores = get_num_cores()
+        n_workers = min(self.n_workers or n_cores, len(trial_ids))
+        settings = dict(self.settings)
+        if settings.get('backend', 'joblib') == 'joblib':
+            settings['n_jobs'] = max(1, n_cores // n_workers)
+
+        # largest populations are started first, so the rung does not end waiting for a single large trial
+        trial_ids = sorted(trial_ids, key=lambda trial_id: self.get_params(trial_id)['population_size'], reverse=True)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {trial_id: executor.submit(run_trial, os.path.join(self.output_folder, trial_id), n_generations,
+                                                 self.get_params(trial_id), settings)
+                       for trial_id in trial_ids}
+            for trial_id, future in futures.items():
+                self.results[trial_id] = future.result()
+
+    def get_params(self, trial_id):
+        """ Get parameters of the genetic algorithm of a trial"""
+        return self.trials[int(trial_id.split('-')[1])]
+
+    def rank(self, trial_ids):
+        """ Sort trials from best to worst. Ties are broken by best fitness
+
+        Args:
+            trial_ids (list): ids of the trials
+
+        Returns:
+            list: sorted trial ids
+        """
+        return sorted(trial_ids, key=lambda trial_id: (self.results[trial_id][self.metric],
+                                                       self.results[trial_id]['best_fitness']), reverse=True)
+
+    def rank_results(self):
+        """ Sort all trials with results from best to worst. Trials that are stopped early are ranked after trials
+            that continued, because their results are of fewer generations
+
+        Returns:
+            list: sorted trial ids
+        """
+        return sorted(self.rank(list(self.results)), key=lambda trial_id: self.results[trial_id]['generations'],
+                      reverse=True)
+
+    def run(self):
+        """ Run sweep and write comparison table
+
+        Returns:
+            list: ids of trials sorted from best to worst, the trials of the last rung first
+        """
+        trial_ids = [self.get_trial_id(i_trial) for i_trial in range(len(self.trials))]
+        for n_generations in get_rung_budgets(self.min_generations, self.max_generations, self.eta):
+            self.run_rung(trial_ids, n_generations)
+            self.write_results()
+            trial_ids = self.rank(trial_ids)[:max(1, int(math.ceil(len(trial_ids) / self.eta)))]
+        return self.rank_results()
+
+    def write_results(self):
+        """ Write comparison table of all trials, sorted from best to worst, see rank_results """
+        trial_ids = self.rank_results()
+        columns = list(SWEEP_PARAMETERS) + ['generations', 'best_score', 'best_fitness', 'population_score']
+        with open(os.path.join(self.output_folder, file_name_sweep_results), 'w') as file:
+            file.write(','.join(['trial'] + columns) + '\n')
+            for trial_id in trial_ids:
+                values = dict(self.get_params(trial_id), **self.results[trial_id])
+                file.write(','.join([trial_id] + [str(values[column]) for column in columns]) + '\n')
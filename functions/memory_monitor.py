@@ -0,0 +1,216 @@
+""" Memory instrumentation of the genetic algorithm. The resident memory (RSS) of the training process and its worker
+processes is recorded for each phase of a generation, optionally together with the Python allocations traced by
+tracemalloc. A memory budget limits the number of games that are played at the same time.
+
+RSS values are read from /proc on Linux. On other platforms only the peak RSS of the whole process is known.
+"""
+import contextlib
+import os
+import tracemalloc
+import warnings
+
+MB = 2**20
+
+# smallest number of games that are played at the same time. Playing fewer games at once is very slow, while it saves
+# little memory
+MIN_CHUNK_SIZE = 100
+
+# columns of the memory usage csv file
+MEMORY_COLUMNS = ('generation', 'phase', 'n_individuals', 'chunk_size', 'rss_mb', 'peak_rss_mb', 'children_rss_mb',
+                  'traced_mb', 'traced_peak_mb', 'bytes_per_individual', 'top_allocation')
+
+
+def read_process_status(pid='self'):
+    """ Read memory values of a process from /proc/<pid>/status
+
+    Args:
+        pid (int or str): process id, 'self' for this process
+
+    Returns:
+        dict: values in bytes by name, e.g. VmRSS (current RSS) and VmHWM (peak RSS). Empty when not available
+    """
+    try:
+        with open('/proc/%s/status' % pid) as file:
+            lines = file.readlines()
+    except OSError:
+        return {}
+    return {line.split(':')[0]: int(line.split()[1]) * 1024 for line in lines if line.startswith('Vm')}
+
+
+def get_rss():
+    """ Get current resident memory of this process in bytes, nan when not available """
+    return read_process_status().get('VmRSS', float('nan'))
+
+
+def get_peak_rss():
+    """ Get peak resident memory of this process in bytes, since the start of the process or since reset_peak_rss """
+    status = read_process_status()
+    if 'VmHWM' in status:
+        return status['VmHWM']
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    """ Reset peak resident memory of this process to the current resident memory (Linux only)
+
+    Returns:
+        bool: True if the peak is reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_children_rss(pid=None):
+    """ Get resident memory of all child processes, e.g. joblib workers, in bytes (Linux only)
+
+    Args:
+        pid (int): parent process, when None this process
+
+    Returns:
+        int: sum of resident memory of all descendants, 0 when not available
+    """
+    pid = pid or os.getpid()
+    try:
+        children = []
+        for thread in os.listdir('/proc/%i/task' % pid):
+            with open('/proc/%i/task/%s/children' % (pid, thread)) as file:
+                children += [int(child) for child in file.read().split()]
+    except OSError:
+        return 0
+    return sum(read_process_status(child).get('VmRSS', 0) + get_children_rss(child) for child in children)
+
+
+def estimate_game_bytes(backend, grid_size=10, n_genes=740):
+    """ Estimate the memory needed per game while the games of a population are played
+
+    Args:
+        backend (str): 'serial', 'joblib', 'vectorized' or 'out_of_core'
+        grid_size (int): Size of the grid
+        n_genes (int): number of genes of a snake
+
+    Returns:
+        int: bytes per game
+    """
+    dna_bytes = 8 * n_genes
+    if backend == 'serial':
+        # games are played one at a time
+        return 0
+    if backend == 'joblib':
+        # pickled snake in the main process and the unpickled snake in a worker
+        return 2 * (dna_bytes + 1024)
+    # vectorized: DNA, weights, body ring buffer and occupancy grid. Arrays are copied when dead snakes are removed
+    game_bytes = 2 * (2 * dna_bytes + 8 * (grid_size**2 + 2) + (grid_size + 2)**2) + 1024
+    if backend == 'out_of_core':
+        # memory mapped DNA values of the genome file
+        game_bytes += dna_bytes
+    return game_bytes
+
+
+class MemoryMonitor:
+    """ Record memory usage of each phase of a generation and limit the memory used to play the games
+
+    Attributes:
+        output_path (str): path to csv file the records are appended to. When None the records are only kept in memory
+        budget (int): maximum resident memory in bytes of the process and its workers. When None there is no limit
+        trace_allocations (bool): When True the Python allocations are traced with tracemalloc. This slows down
+            training, but shows where the memory is allocated
+        baseline_rss (int): resident memory in bytes when the monitor is created, before the population exists
+        records (list): memory usage (dict) of each phase
+    """
+
+    def __init__(self, output_path=None, budget=None, trace_allocations=False):
+        self.output_path = output_path
+        self.budget = budget
+        self.trace_allocations = trace_allocations
+        self.baseline_rss = get_rss()
+        self.records = []
+
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if output_path is not None and not os.path.exists(output_path):
+            with open(output_path, 'w') as file:
+                file.write(','.join(MEMORY_COLUMNS) + '\n')
+
+    def get_chunk_size(self, n_games, game_bytes):
+        """ Get the number of games that can be played at the same time within the memory budget
+
+        Args:
+            n_games (int): number of games that have to be played
+            game_bytes (int): memory needed per game, see estimate_game_bytes
+
+        Returns:
+            int: number of games that can be played at the same time, at least MIN_CHUNK_SIZE. None when all games
+                fit in the budget
+        """
+        if self.budget is None or game_bytes * n_games <= 0:
+            return None
+        used = get_rss() + get_children_rss()
+        available = self.budget - used
+        if game_bytes * n_games <= available:
+            return None
+        chunk_size = int(available // game_bytes)
+        if chunk_size < MIN_CHUNK_SIZE:
+            warnings.warn("Memory budget of %.0f MB cannot be met, %.0f MB is already used. Games are played in chunks "
+                          "of %i" % (self.budget / MB, used / MB, MIN_CHUNK_SIZE))
+            chunk_size = MIN_CHUNK_SIZE
+        return chunk_size if chunk_size < n_games else None
+
+    @contextlib.contextmanager
+    def phase(self, name, generation, n_individuals, chunk_size=None):
+        """ Record memory usage of a phase. The peak values are reset at the start of the phase
+
+        Args:
+            name (str): name of the phase, e.g. 'play_games'
+            generation (int): generation
+            n_individuals (int): number of individuals in the population
+            chunk_size (int): number of games played at the same time, None when all games are played at once
+        """
+        reset_peak_rss()
+        traced_start = (0, 0)
+        if self.trace_allocations:
+            # tracemalloc.reset_peak needs Python 3.9
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            traced_start = tracemalloc.get_traced_memory()
+        yield
+
+        record = {'generation': generation,
+                  'phase': name,
+                  'n_individuals': n_individuals,
+                  'chunk_size': chunk_size or '',
+                  'rss_mb': get_rss() / MB,
+                  'peak_rss_mb': get_peak_rss() / MB,
+                  'children_rss_mb': get_children_rss() / MB,
+                  'traced_mb': '',
+                  'traced_peak_mb': '',
+                  'top_allocation': ''}
+        record['bytes_per_individual'] = (record['peak_rss_mb'] + record['children_rss_mb']) * MB - self.baseline_rss
+        record['bytes_per_individual'] /= max(1, n_individuals)
+        if self.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if peak == traced_start[1] and not hasattr(tracemalloc, 'reset_peak'):
+                # the peak of the phase is below an earlier peak and not known, the largest traced memory measured
+                # during the phase is used instead
+                peak = max(traced_start[0], current)
+            record['traced_mb'], record['traced_peak_mb'] = current / MB, peak / MB
+            statistics = tracemalloc.take_snapshot().statistics('lineno')
+            if statistics:
+                frame = statistics[0].traceback[0]
+                record['top_allocation'] = '%s:%i %.1f MB' % (os.path.basename(frame.filename), frame.lineno,
+                                                              statistics[0].size / MB)
+        self.records.append(record)
+
+        if self.output_path is not None:
+            with open(self.output_path, 'a') as file:
+                file.write(','.join('%.1f' % record[column] if isinstance(record[column], float) else
+                                    str(record[column]) for column in MEMORY_COLUMNS) + '\n')
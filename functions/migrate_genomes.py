@@ -0,0 +1,88 @@
+""" Convert the best snakes of older training sessions, saved as pickled snakes (best_snake_generatie-*.obj) or genome
+files (best_snake_generatie-*.genome), to the genome archive of the session (hall_of_fame.archive)
+
+Usage:
+    python -m functions.migrate_genomes <folder> [<folder> ...] [--remove]
+"""
+import argparse
+import os
+import pickle
+import re
+
+from functions.genome_archive import ARCHIVE_FILE_NAME, GenomeArchive
+from functions.genome_file import load_genomes
+
+SNAKE_FILE_PATTERN = re.compile(r"^best_snake_generatie-(\d+)_score-(\d+)\.(obj|genome)$")
+
+
+def read_snake_file(path):
+    """ Read DNA, score, fitness and grid size of a pickled snake or genome file
+
+    Args:
+        path (str): path to pickled snake or genome file
+
+    Returns:
+        tuple: DNA, score, fitness and grid size
+    """
+    if path.endswith('.obj'):
+        with open(path, 'rb') as file:
+            snake = pickle.load(file)
+        return snake.dna, snake.total_apples_found, snake.fitness, snake.grid_size
+
+    header, dna = load_genomes(path)
+    return dna[0], header['score'], header['fitness'], header['grid_size']
+
+
+def migrate_session(folder, file_names, remove=False):
+    """ Add the best snakes of a session to the archive of the session
+
+    Args:
+        folder (str): session folder
+        file_names (list): file names of the best snakes in the session folder
+        remove (bool): When True the files are removed after they are added to the archive
+
+    Returns:
+        int: number of snakes added to the archive
+    """
+    archive = None
+    n_converted = 0
+    for generation, file_name in sorted((int(SNAKE_FILE_PATTERN.match(name).group(1)), name) for name in file_names):
+        path = os.path.join(folder, file_name)
+        dna, score, fitness, grid_size = read_snake_file(path)
+
+        if archive is None:
+            archive = GenomeArchive(os.path.join(folder, ARCHIVE_FILE_NAME), grid_size=grid_size)
+        if generation not in archive:
+            archive.append(dna, generation, score, fitness)
+            n_converted += 1
+        if remove:
+            os.remove(path)
+    return n_converted
+
+
+def migrate_folder(folder, remove=False):
+    """ Convert the best snakes in a folder and its sub folders. Each folder gets its own archive.
+
+    Args:
+        folder (str): folder to search for best snakes
+        remove (bool): When True the converted files are removed
+
+    Returns:
+        int: number of converted snakes
+    """
+    n_converted = 0
+    for root, _, file_names in os.walk(folder):
+        file_names = [file_name for file_name in file_names if SNAKE_FILE_PATTERN.match(file_name)]
+        if file_names:
+            n_converted += migrate_session(root, file_names, remove)
+    return n_converted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert best snakes of older training sessions to genome archives")
+    parser.add_argument('folders', nargs='+', help="folders to search for best snakes")
+    parser.add_argument('--remove', action='store_true', help="remove the files after conversion")
+    args = parser.parse_args()
+
+    for folder in args.folders:
+        print("Converted %i snakes in %s" % (migrate_folder(folder, args.remove), folder))
@@ -0,0 +1,253 @@
+import os
+import struct
+
+import numpy as np
+
+from functions.snake import DEATH_CAUSES
+from functions.vectorized_snake import DECISION_MOVES
+
+# file layout: fixed size header, an index with one record per game, the packed moves of all games and the apple
+# timestamps of all games. Each move is one of the 4 decisions of the snake (['left', 'right', 'up', 'down']) and is
+# stored in 2 bits, 4 moves per byte with the first move in the lowest bits. The file is written once per generation
+# and is read with memory maps, so a single game can be decoded without reading the other games.
+MOVE_LOG_MAGIC = b'SNKM'
+MOVE_LOG_VERSION = 1
+MOVE_LOG_EXTENSION = '.moves'
+APPLE_MOVE_DTYPE = np.dtype('<u4')
+
+# magic, version, header size, grid size, apple seed, generation, number of games, index offset
+_HEADER_STRUCT = struct.Struct('<4sHHHiiIQ')
+HEADER_SIZE = 64
+
+INDEX_DTYPE = np.dtype([('moves_played', '<u4'),
+                        ('score', '<u4'),
+                        ('fitness', '<f8'),
+                        ('death_cause', '<i4'),
+                        ('moves_offset', '<u8'),
+                        ('apples_offset', '<u8')])
+
+
+def pack_moves(moves):
+    """ Pack moves in 2 bits per move
+
+    Args:
+        moves (np.array): decision (0-3) of each move
+
+    Returns:
+        np.array: uint8 array with 4 moves per byte
+    """
+    moves = np.asarray(moves, dtype=np.uint8)
+    padded = np.zeros(-(-moves.size // 4) * 4, dtype=np.uint8)
+    padded[:moves.size] = moves
+    padded = padded.reshape(-1, 4)
+    return padded[:, 0] | (padded[:, 1] << 2) | (padded[:, 2] << 4) | (padded[:, 3] << 6)
+
+
+def unpack_moves(packed, n_moves):
+    """ Unpack moves that are packed by pack_moves
+
+    Args:
+        packed (np.array): uint8 array with 4 moves per byte
+        n_moves (int): number of moves
+
+    Returns:
+        np.array: decision (0-3) of each move
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    return ((packed[:, None] >> np.arange(0, 8, 2, dtype=np.uint8)) & 3).reshape(-1)[:n_moves]
+
+
+def get_move_log_name(generation):
+    """ Get file name of the move log of a generation """
+    return 'generation_%05i%s' % (generation, MOVE_LOG_EXTENSION)
+
+
+def get_death_code(death_cause):
+    """ Get code of a death cause, -1 when the snake did not die """
+    return DEATH_CAUSES.index(death_cause) if death_cause in DEATH_CAUSES else -1
+
+
+def write_move_log(path, moves, apple_moves, fitness, scores, death_causes, grid_size=10, apple_seed=2,
+                   generation=-1):
+    """ Write the moves of the games of a generation to a move log file. The file is first written to a temporary file
+        and then moved, so readers never see a half written file.
+
+    Args:
+        path (str): path to move log file
+        moves (list): for each game an array with the decision (0-3) of each move
+        apple_moves (list): for each game an array with the number of moves played when each apple was found
+        fitness (list): fitness of each game
+        scores (list): number of apples found in each game
+        death_causes (list): code of the death cause of each game, see get_death_code
+        grid_size (int): size of the board the games are played on
+        apple_seed (int): seed used to generate the apples of the board
+        generation (int): generation of the games, -1 if unknown
+    """
+    n_games = len(moves)
+    n_moves = np.asarray([len(game_moves) for game_moves in moves], dtype=np.int64)
+    n_apples = np.asarray([len(game_apple_moves) for game_apple_moves in apple_moves], dtype=np.int64)
+
+    # the moves of each game start at a new byte. All games are packed at once, packing them one by one is slow
+    n_bytes = -(-n_moves // 4)
+    moves_start = np.cumsum(n_bytes) - n_bytes
+    padded = np.zeros(4 * n_bytes.sum(), dtype=np.uint8)
+    if n_moves.sum():
+        padded[np.repeat(4 * moves_start - (np.cumsum(n_moves) - n_moves), n_moves) + np.arange(n_moves.sum())] = \
+            np.concatenate(moves)
+    packed = pack_moves(padded)
+    apple_moves = np.concatenate([np.zeros(0, dtype=APPLE_MOVE_DTYPE)] + list(apple_moves)).astype(APPLE_MOVE_DTYPE)
+
+    index = np.zeros(n_games, dtype=INDEX_DTYPE)
+    index['moves_played'] = n_moves
+    index['score'] = scores
+    index['fitness'] = fitness
+    index['death_cause'] = death_causes
+    index['moves_offset'] = HEADER_SIZE + index.nbytes + moves_start
+    index['apples_offset'] = HEADER_SIZE + index.nbytes + packed.nbytes + \
+        (np.cumsum(n_apples) - n_apples) * APPLE_MOVE_DTYPE.itemsize
+
+    header = _HEADER_STRUCT.pack(MOVE_LOG_MAGIC, MOVE_LOG_VERSION, HEADER_SIZE, grid_size, apple_seed, generation,
+                                 n_games, HEADER_SIZE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(header.ljust(HEADER_SIZE, b'\0'))
+        file.write(index.tobytes())
+        file.write(packed.tobytes())
+        file.write(apple_moves.tobytes())
+    os.replace(tmp_path, path)
+
+
+def write_snake_moves(path, snakes, generation=-1):
+    """ Write the moves of snakes that recorded their moves to a move log file, see Snake.start_recording
+
+    Args:
+        path (str): path to move log file
+        snakes (list): Snake objects that have played a game
+        generation (int): generation of the snakes
+    """
+    if any(snake.moves is None for snake in snakes):
+        raise ValueError("All snakes must record their moves, see Snake.start_recording")
+    write_move_log(path, [snake.moves for snake in snakes], [snake.apple_moves for snake in snakes],
+                   [snake.fitness for snake in snakes], [snake.total_apples_found for snake in snakes],
+                   [get_death_code(snake.death_cause) for snake in snakes],
+                   grid_size=snakes[0].grid_size if snakes else 10,
+                   apple_seed=snakes[0].apple_seed if snakes else 2, generation=generation)
+
+
+class MoveLog:
+    """ Read the games of a move log file. The file is memory mapped, only the games that are decoded are read.
+
+    Attributes:
+        path (str): path to move log file
+        grid_size (int): size of the board the games are played on
+        apple_seed (int): seed used to generate the apples of the board
+        generation (int): generation of the games
+        index (np.array): structured array with for each game the number of moves played, score, fitness, death cause
+            and the offsets of its moves and apple timestamps in the file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            raw = file.read(HEADER_SIZE)
+        if len(raw) < _HEADER_STRUCT.size:
+            raise ValueError("File %s is too small to be a move log" % path)
+        magic, version, _, self.grid_size, self.apple_seed, self.generation, n_games, index_offset = \
+            _HEADER_STRUCT.unpack_from(raw)
+        if magic != MOVE_LOG_MAGIC:
+            raise ValueError("File %s is not a move log" % path)
+        if version > MOVE_LOG_VERSION:
+            raise ValueError("Move log version %i is not supported (max version %i)" % (version, MOVE_LOG_VERSION))
+
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.index = self._data[index_offset:index_offset + n_games * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_moves(self, game):
+        """ Get moves of a game
+
+        Args:
+            game (int): index of the game
+
+        Returns:
+            np.array: decision (0-3) of each move
+        """
+        record = self.index[game]
+        start = int(record['moves_offset'])
+        return unpack_moves(self._data[start:start + -(-int(record['moves_played']) // 4)],
+                            int(record['moves_played']))
+
+    def get_apple_moves(self, game):
+        """ Get the number of moves played when each apple was found in a game
+
+        Args:
+            game (int): index of the game
+
+        Returns:
+            np.array: number of moves played for each apple found
+        """
+        record = self.index[game]
+        start = int(record['apples_offset'])
+        return self._data[start:start + int(record['score']) * APPLE_MOVE_DTYPE.itemsize].view(APPLE_MOVE_DTYPE)
+
+    def get_death_cause(self, game):
+        """ Get death cause of a game; 'wall', 'body' or 'starvation'. None when the snake did not die """
+        code = int(self.index[game]['death_cause'])
+        return DEATH_CAUSES[code] if code >= 0 else None
+
+    def decode_game(self, game):
+        """ Reconstruct a game from its moves
+
+        Args:
+            game (int): index of the game
+
+        Returns:
+            dict: game with
+                moves (np.array): decision (0-3) of each move
+                head (np.array): moves_played + 1 by 2 array with the position of the head before the first move and
+                    after each move. The last position is where the snake died
+                length (np.array): length of the snake after each move
+                apples (np.array): score by 2 array with the position of the apples that were found
+                apple_moves (np.array): number of moves played when each apple was found
+                death_cause (str): 'wall', 'body' or 'starvation'
+        """
+        from functions.snake_board import get_board_apples
+
+        moves = self.get_moves(game)
+        apple_moves = self.get_apple_moves(game)
+        center = self.grid_size // 2
+        head = np.concatenate([[[center, center]], center + np.cumsum(DECISION_MOVES[moves], axis=0)]).reshape(-1, 2)
+
+        # the snake grows in the move after an apple is found
+        length = 3 + np.searchsorted(apple_moves, np.arange(1, len(moves) + 1))
+        return {'moves': moves,
+                'head': head,
+                'length': length,
+                'apples': get_board_apples(self.grid_size, self.apple_seed)[:len(apple_moves)],
+                'apple_moves': apple_moves,
+                'death_cause': self.get_death_cause(game)}
+
+    def top(self, n, key='score'):
+        """ Get the indices of the n best games
+
+        Args:
+            n (int): number of games
+            key (str): 'score' or 'fitness'
+
+        Returns:
+            np.array: indices of the games sorted from best to worst
+        """
+        if key not in ('score', 'fitness'):
+            raise ValueError("Key %s is not supported" % key)
+        return np.argsort(-self.index[key].astype(np.float64), kind='stable')[:n]
+
+    def get_death_cause_counts(self):
+        """ Count the games of each death cause
+
+        Returns:
+            dict: number of games for each death cause
+        """
+        counts = np.bincount(self.index['death_cause'][self.index['death_cause'] >= 0], minlength=len(DEATH_CAUSES))
+        return dict(zip(DEATH_CAUSES, counts.tolist()))
@@ -0,0 +1,172 @@
+import numpy as np
+
+
+class Optimizer:
+    """ Base class of the optimizers that train the snakes with start_genetic_algorithm. Each generation:
+        1) play_games: play Snake with each snake in the population
+        2) the stats of the population are computed from the fitness and scores of the snakes, the best snake is saved
+        3) generate_population: generate the population of the next generation
+    The population is saved to a genome file with save_population and loaded with load_population, so training can
+    continue from a checkpoint. What is not in the genome file, e.g. a resized population size, is saved with
+    get_state and restored with set_state.
+
+    Attributes:
+        population_size (int): Population size
+        grid_size (int): Size of the grid the snakes play on
+        seed (int): Seed of the random numbers, see functions.random_streams
+        generation (int): Generation of the population, the random numbers of each generation are different
+    """
+
+    # True when the moves of all games can be saved with save_move_log
+    supports_move_logs = False
+
+    @classmethod
+    def from_settings(cls, population_size, output_folder, settings):
+        """ Create optimizer with the settings of start_genetic_algorithm
+
+        Args:
+            population_size (int): Population size
+            output_folder (str): output folder of the training session
+            settings (dict): survival_perc, parent_perc and mutation_rate (values between 0 and 1), grid_size, backend,
+                n_jobs, seed, chunk_size, record_moves, es_sigma and es_learning_rate
+
+        Returns:
+            Optimizer: optimizer with a new random population
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def get_min_population_size(cls, settings):
+        """ Get the smallest population size the optimizer can train
+
+        Args:
+            settings (dict): settings of start_genetic_algorithm, see from_settings
+
+        Returns:
+            int: minimum population size
+        """
+        return 2
+
+    def __len__(self):
+        """ Number of snakes in the current population """
+        raise NotImplementedError
+
+    def generate_population(self):
+        """ Generate a random population or, when the games are played, the population of the next generation """
+        raise NotImplementedError
+
+    def play_games(self, parallel=True, chunk_size=None):
+        """ Play Snake with each snake in population
+
+        Args:
+            parallel (bool): When True the games are played with the backend of the optimizer
+            chunk_size (int): Maximum number of games that are in memory at the same time. When None there is no
+                maximum
+        """
+        raise NotImplementedError
+
+    def load_population(self, dna, generation=0):
+        """ Continue from the DNA of a checkpoint
+
+        Args:
+            dna (np.array): n_genomes by n_genes array with DNA values
+            generation (int): generation of the DNA
+        """
+        raise NotImplementedError
+
+    def save_population(self, path, generation):
+        """ Save the DNA of the population to a genome file
+
+        Args:
+            path (str): path to genome file
+            generation (int): generation of the population
+        """
+        raise NotImplementedError
+
+    def get_fitness(self):
+        """ Get fitness of each snake in the population that played a game
+
+        Returns:
+            np.array: fitness of each snake
+        """
+        raise NotImplementedError
+
+    def get_scores(self):
+        """ Get number of apples found by each snake in the population that played a game
+
+        Returns:
+            np.array: score of each snake
+        """
+        raise NotImplementedError
+
+    def get_best_snake(self):
+        """ Get best snake in population
+
+        Returns:
+            Snake: Snake with the best fitness in population
+        """
+        raise NotImplementedError
+
+    def resize_population(self, population_size):
+        """ Change the population size. The next population generated by generate_population has the new size
+
+        Args:
+            population_size (int): new population size
+        """
+        self.population_size = population_size
+
+    def get_state(self):
+        """ Get the state of the optimizer that is not saved by save_population
+
+        Returns:
+            dict: state with values that can be saved as JSON
+        """
+        return {'population_size': self.population_size}
+
+    def set_state(self, state):
+        """ Restore a state of get_state. Call before load_population
+
+        Args:
+            state (dict): state of the optimizer
+        """
+        self.population_size = state['population_size']
+
+    def get_population_fitness(self):
+        """ Get mean fitness of entire population
+
+        Returns:
+            float: Mean population fitness
+        """
+        return np.mean(self.get_fitness())
+
+    def get_population_fitness_std(self):
+        """ Get standard deviation of the fitness of entire population
+
+        Returns:
+            float: Standard deviation of population fitness
+        """
+        return np.std(self.get_fitness())
+
+    def get_population_score(self):
+        """ Get mean population score (number of apples eaten)
+
+        Returns:
+            float: Mean population score
+        """
+        return np.mean(self.get_scores())
+
+    def get_best_fitness(self):
+        """ Get fitness of best snake in population
+
+        Returns:
+            float: Fitness of best snake
+        """
+        return np.max(self.get_fitness())
+
+    def get_best_score(self):
+        """ Get score of best snake in population
+
+        Returns:
+            float: Score of best snake
+        """
+        return np.max(self.get_scores())
@@ -0,0 +1,266 @@
+import os
+import shutil
+
+import numpy as np
+
+from functions.genetic_algorithm import get_min_population_size
+from functions.genome_file import create_genome_file, map_genomes, pack_header, read_header, \
+    snake_from_dna
+from functions.optimizer import Optimizer
+from functions.random_streams import draw_children, get_seed, random_dna
+from functions.sampling_profiler import profile_worker
+from default import file_name_population
+
+
+def play_chunk(path, start, stop, grid_size):
+    """ Play Snake with a range of genomes of a genome file
+
+    Args:
+        path (str): path to genome file with the population
+        start (int): index of first genome
+        stop (int): index after the last genome
+        grid_size (int): Size of the grid
+
+    Returns:
+        tuple: fitness and number of apples found of each genome
+    """
+    from functions.vectorized_snake import play_games_batch
+
+    with profile_worker():
+        dna = np.array(map_genomes(path, start, stop), dtype=np.float64)
+        fitness, total_apples_found, _ = play_games_batch(dna, grid_size)
+    return fitness, total_apples_found
+
+
+class OutOfCoreGeneticAlgorithm(Optimizer):
+    """ Genetic algorithm for very large populations. The steps are the same as in GeneticAlgorithm, but the population
+        is not kept in memory as Snake objects. It lives in a genome file on disk:
+        1) The games are played in chunks of genomes, which are memory mapped one chunk at a time
+        2) Survivors and parents are selected on the fitness of the population only
+        3) The new population is written chunk by chunk to a second genome file, which replaces the population file
+        The memory that is used is bounded by the chunk size, not by the population size.
+
+    Attributes:
+        population_size (int): Population size
+        survival_perc (float): Survival percentages. Value between 0 and 1
+        mutation_rate (float): Mutation percentages. Value between 0 and 1
+        parent_perc (float): Parent percentages. Value between 0 and 1
+        population_path (str): path to genome file with the population
+        chunk_size (int): number of genomes that are in memory at the same time
+        grid_size (int): Size of the grid the snakes play on
+        backend (str): 'joblib' to play the chunks in parallel processes, otherwise the chunks are played one after
+            the other. Each chunk is played with the vectorized backend
+        n_jobs (int): Number of processes used by the joblib backend. When None all computer cores are used
+        seed (int): Seed of the random numbers, see functions.random_streams. The random numbers of a snake do not
+            depend on the chunk size
+        generation (int): Generation of the population, the random numbers of each generation are different
+        fitness (np.array): fitness of each snake in the population, None before the games are played
+        score (np.array): number of apples found by each snake in the population, None before the games are played
+    """
+
+    def __init__(self, population_size, survival_perc, parent_perc, mutation_rate, population_path, chunk_size=10000,
+                 grid_size=10, backend='vectorized', n_jobs=None, seed=None):
+        self.population_size = population_size
+        self.survival_perc = survival_perc
+        self.mutation_rate = mutation_rate
+        self.parent_perc = parent_perc
+        self.population_path = population_path
+        self.chunk_size = chunk_size
+        self.grid_size = grid_size
+        self.backend = backend
+        self.n_jobs = n_jobs
+        self.seed = get_seed(seed)
+        self.generation = 0
+
+        self.fitness = None
+        self.score = None
+        self.generate_population()
+
+    @classmethod
+    def from_settings(cls, population_size, output_folder, settings):
+        return cls(population_size, settings['survival_perc'], settings['parent_perc'], settings['mutation_rate'],
+                   os.path.join(output_folder, file_name_population), settings['chunk_size'] or 10000,
+                   grid_size=settings['grid_size'], backend=settings['backend'], n_jobs=settings['n_jobs'],
+                   seed=settings['seed'])
+
+    @classmethod
+    def get_min_population_size(cls, settings):
+        return get_min_population_size(settings['survival_perc'], settings['parent_perc'])
+
+    def __len__(self):
+        return read_header(self.population_path)['n_genomes']
+
+    def get_chunks(self, chunk_size=None, n_genomes=None):
+        """ Get ranges of genomes that are processed at once
+
+        Args:
+            chunk_size (int): number of genomes in a range. When None the chunk size of the genetic algorithm is used
+            n_genomes (int): number of genomes. When None the number of genomes in the population file is used
+
+        Returns:
+            list: list of (start, stop) tuples
+        """
+        chunk_size = chunk_size or self.chunk_size
+        n_genomes = len(self) if n_genomes is None else n_genomes
+        return [(start, min(start + chunk_size, n_genomes)) for start in range(0, n_genomes, chunk_size)]
+
+    def read_rows(self, rows):
+        """ Read genomes of the population. Consecutive rows are read at once, only the requested rows are read in
+            memory
+
+        Args:
+            rows (np.array): indices of the genomes
+
+        Returns:
+            np.array: len(rows) by n_genes array with the DNA values
+        """
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        header = read_header(self.population_path)
+        dna = np.empty((len(unique_rows), header['n_genes']), dtype=header['dtype'])
+        row_size = dna.itemsize * header['n_genes']
+
+        # split unique rows in runs of consecutive rows
+        run_starts = np.flatnonzero(np.diff(unique_rows, prepend=-2) != 1)
+        run_stops = np.append(run_starts[1:], len(unique_rows))
+        with open(self.population_path, 'rb') as file:
+            for run_start, run_stop in zip(run_starts.tolist(), run_stops.tolist()):
+                file.seek(header['header_size'] + int(unique_rows[run_start]) * row_size)
+                file.readinto(memoryview(dna[run_start:run_stop]).cast('B'))
+        return dna[inverse.reshape(-1)].astype(np.float64)
+
+    def generate_population(self):
+        """ Generate population
+
+        When no population exists: create new population file with random DNA
+        When a population exists: create new population file based on fittest snakes and children.
+        """
+        next_path = self.population_path + '.next'
+        if self.fitness is None:
+            create_genome_file(next_path, self.population_size, self.grid_size)
+            header = read_header(next_path)
+            for start, stop in self.get_chunks(n_genomes=self.population_size):
+                genomes = map_genomes(next_path, start, stop, mode='r+', header=header)
+                genomes[:] = random_dna(self.seed, start, stop, header['n_genes'], self.generation)
+                genomes.flush()
+                del genomes
+        else:
+            self.generation += 1
+
+            # Determine fittest snakes and which snakes may be parents
+            ranking = np.argsort(-self.fitness, kind='stable')
+            survivors = ranking[:int(self.population_size * self.survival_perc)]
+            parents = ranking[:int(self.population_size * self.parent_perc)]
+
+            # Create new population. Survivors + population_size - n_parents children, the same as GeneticAlgorithm
+            n_genomes = len(survivors) + self.population_size - len(parents)
+            create_genome_file(next_path, n_genomes, self.grid_size)
+            header = read_header(next_path)
+            for start, stop in self.get_chunks(n_genomes=n_genomes):
+                genomes = map_genomes(next_path, start, stop, mode='r+', header=header)
+                n_survivors = max(0, min(stop, len(survivors)) - start)
+                if n_survivors:
+                    genomes[:n_survivors] = self.read_rows(survivors[start:start + n_survivors])
+                if stop - start > n_survivors:
+                    first_child = start + n_survivors - len(survivors)
+                    genomes[n_survivors:] = self.generate_children(parents, first_child, stop - len(survivors))
+                genomes.flush()
+                del genomes
+
+        os.replace(next_path, self.population_path)
+        self.fitness = None
+        self.score = None
+
+    def generate_children(self, parents, start, stop):
+        """ Generate children. Each child is a copy of the DNA of a random parent with random mutations, the same as in
+            GeneticAlgorithm
+
+        Args:
+            parents (np.array): indices of the genomes that may be parents
+            start (int): index of the first child
+            stop (int): index after the last child
+
+        Returns:
+            np.array: stop - start by n_genes array with the DNA of the children
+        """
+        n_genes = read_header(self.population_path)['n_genes']
+        parent_indices, mutations = draw_children(self.seed, self.generation, start, stop, len(parents), n_genes,
+                                                  self.mutation_rate)
+
+        # add random value picked from gaussian distribution (mean=0, std=0.5) to genes that are mutated
+        return self.read_rows(parents[parent_indices]) + mutations
+
+    def load_population(self, dna, generation=0):
+        """ Replace population by the given DNA. The population size is not changed, see
+            GeneticAlgorithm.load_population
+
+        Args:
+            dna (np.array): n_snakes by n_genes array with the DNA of each snake, e.g. memory mapped from a genome file
+            generation (int): generation of the population
+        """
+        create_genome_file(self.population_path, dna.shape[0], self.grid_size)
+        header = read_header(self.population_path)
+        for start, stop in self.get_chunks():
+            genomes = map_genomes(self.population_path, start, stop, mode='r+', header=header)
+            genomes[:] = dna[start:stop]
+            genomes.flush()
+            del genomes
+        self.generation = generation
+        self.fitness = None
+        self.score = None
+
+    def save_population(self, path, generation):
+        """ Save population to a genome file
+
+        Args:
+            path (str): path to genome file
+            generation (int): generation of the population
+        """
+        header = read_header(self.population_path)
+        shutil.copyfile(self.population_path, path + '.tmp')
+        with open(path + '.tmp', 'r+b') as file:
+            file.write(pack_header(header['topology'], header['n_genomes'], self.grid_size, header['apple_seed'],
+                                   generation))
+        os.replace(path + '.tmp', path)
+
+    def play_games(self, parallel=True, chunk_size=None):
+        """ Play Snake with each snake in population, one chunk of genomes at a time
+
+        Args:
+            parallel (bool): When True and the backend is joblib the chunks are played in parallel processes
+            chunk_size (int): Maximum number of games that are in memory at the same time. When smaller than the
+                chunk size of the genetic algorithm, the games are played in smaller chunks
+        """
+        if parallel and self.backend == 'joblib':
+            from joblib import Parallel, delayed
+            from functions.game_backends import get_num_cores
+
+            # the processes play n_jobs chunks at the same time
+            n_jobs = self.n_jobs or get_num_cores()
+            chunks = self.get_chunks(None if chunk_size is None else min(self.chunk_size, max(1, chunk_size // n_jobs)))
+            results = Parallel(n_jobs=n_jobs, pre_dispatch='n_jobs')(
+                delayed(play_chunk)(self.population_path, start, stop, self.grid_size) for start, stop in chunks)
+        else:
+            chunks = self.get_chunks(None if chunk_size is None else min(self.chunk_size, chunk_size))
+            results = [play_chunk(self.population_path, start, stop, self.grid_size) for start, stop in chunks]
+
+        self.fitness = np.concatenate([fitness for fitness, _ in results])
+        self.score = np.concatenate([score for _, score in results])
+
+    def get_fitness(self):
+        return self.fitness
+
+    def get_scores(self):
+        return self.score
+
+    def get_best_snake(self):
+        """ Get best snake in population
+
+        Returns:
+            Snake: Snake with the best fitness in population
+        """
+        best = int(np.argmax(self.fitness))
+        snake = snake_from_dna(self.read_rows(np.asarray([best]))[0], self.grid_size)
+        snake.fitness = float(self.fitness[best])
+        snake.total_apples_found = int(self.score[best])
+        snake.alive = False
+        return snake
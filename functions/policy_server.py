@@ -0,0 +1,319 @@
+""" Inference service for trained snakes. Clients send the vision of their snake and receive the decision of the brain.
+Requests of all clients that arrive within a small time window are evaluated in a single batched forward pass.
+
+Protocol (little-endian), requests can be pipelined on a connection:
+    request:  request id (uint32), model index (uint16), n_input vision values (float64)
+    response: request id (uint32), decision index (uint8) into ['left', 'right', 'up', 'down'], INVALID_REQUEST when
+        the request is invalid, e.g. the model does not exist
+
+Usage:
+    python -m functions.policy_server --genome best.genome [--archive hall_of_fame.archive --generations 100 200]
+        [--port 8765 | --unix-socket /tmp/snake.sock] [--batch-window 0.001] [--max-batch-size 1024]
+"""
+import argparse
+import asyncio
+import collections
+import struct
+import time
+
+import numpy as np
+
+from functions.brain import get_weights_from_dna_batch, forward_propagation_batch
+
+REQUEST_HEADER = struct.Struct('<IH')
+RESPONSE = struct.Struct('<IB')
+DECISIONS = ['left', 'right', 'up', 'down']
+
+# decision index of the response to an invalid request
+INVALID_REQUEST = 255
+
+
+class PolicyServer:
+    """ Serve the decisions of one or more brains to many clients
+
+    Attributes:
+        dna (np.array): n_models by n_genes array with the DNA of each model
+        n_input (int): number of vision values of a request
+        batch_window (float): time in seconds to wait for more requests after the first request of a batch
+        max_batch_size (int): maximum number of requests in a batch
+        latencies (collections.deque): latencies in seconds of the latest requests, from receiving the request until
+            the decision is known
+        batch_sizes (collections.Counter): number of batches for each batch size
+    """
+
+    def __init__(self, dna, n_input=24, batch_window=0.001, max_batch_size=1024, n_latencies=100000):
+        self.dna = np.asarray(dna, dtype=np.float64).reshape(-1, np.shape(dna)[-1])
+        self.n_input = n_input
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.latencies = collections.deque(maxlen=n_latencies)
+        self.batch_sizes = collections.Counter()
+
+        self._weights = get_weights_from_dna_batch(self.dna)
+        self._request_size = REQUEST_HEADER.size + 8 * n_input
+        self._queue = None
+        self._tasks = set()
+
+    def decide_batch(self, models, vision):
+        """ Make decisions for a batch of requests with one forward pass
+
+        Args:
+            models (np.array): model index of each request
+            vision (np.array): n_requests by n_input array with the vision of each request
+
+        Returns:
+            np.array: decision index of each request
+        """
+        weights = tuple(weight[models] for weight in self._weights)
+        return np.argmax(forward_propagation_batch(weights, vision), axis=1)
+
+    async def batch_requests(self):
+        """ Collect requests into batches and answer them. Runs until cancelled """
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # requests that are already waiting are added without waiting any longer
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            futures, models, vision, received = zip(*batch)
+            decisions = self.decide_batch(np.asarray(models), np.stack(vision))
+
+            now = time.perf_counter()
+            self.latencies.extend(now - start_time for start_time in received)
+            self.batch_sizes[len(batch)] += 1
+            for future, decision in zip(futures, decisions.tolist()):
+                if not future.cancelled():
+                    future.set_result(decision)
+
+    async def handle_client(self, reader, writer):
+        """ Read requests of a client and write the responses when their batch is evaluated. Invalid requests are
+            answered with INVALID_REQUEST. The connection is closed when the client disconnects or on an unexpected
+            error, so the client never waits for a response that does not come.
+        """
+        loop = asyncio.get_event_loop()
+        drain_lock = asyncio.Lock()
+
+        async def send(request_id, decision):
+            writer.write(RESPONSE.pack(request_id, decision))
+            # older Python versions do not support waiting for the same writer in more than one drain call
+            async with drain_lock:
+                await writer.drain()
+
+        async def respond(request_id, future):
+            try:
+                await send(request_id, await future)
+            except ConnectionError:
+                pass
+
+        try:
+            while True:
+                message = await reader.readexactly(self._request_size)
+                request_id, model = REQUEST_HEADER.unpack_from(message)
+                if model >= self.dna.shape[0]:
+                    await send(request_id, INVALID_REQUEST)
+                    continue
+                vision = np.frombuffer(message, dtype='<f8', offset=REQUEST_HEADER.size)
+
+                future = loop.create_future()
+                self._queue.put_nowait((future, model, vision, time.perf_counter()))
+                asyncio.ensure_future(respond(request_id, future))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # the server is shut down. The handler ends normally, asyncio reports cancelled connection handlers as
+            # errors
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, unix_socket=None):
+        """ Start server and batching of requests
+
+        Args:
+            host (str): host to listen on
+            port (int): port to listen on
+            unix_socket (str): path of a unix socket to listen on instead of host and port
+
+        Returns:
+            asyncio.AbstractServer: server
+        """
+        self._queue = asyncio.Queue()
+        self._start_task(self.batch_requests())
+        if unix_socket is not None:
+            return await asyncio.start_unix_server(self._connect, path=unix_socket)
+        return await asyncio.start_server(self._connect, host, port)
+
+    def _start_task(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _connect(self, reader, writer):
+        self._start_task(self.handle_client(reader, writer))
+
+    async def stop(self):
+        """ Stop batching of requests and close the connections of all clients. Close the server returned by start
+            first, so no new clients connect
+        """
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self):
+        """ Get latency percentiles and batch size histogram
+
+        Returns:
+            dict: number of requests, p50 and p99 latency in milliseconds and the number of batches per batch size
+        """
+        latencies = np.asarray(self.latencies) * 1000
+        return {'n_requests': sum(size * count for size, count in self.batch_sizes.items()),
+                'p50_ms': float(np.percentile(latencies, 50)) if latencies.size else float('nan'),
+                'p99_ms': float(np.percentile(latencies, 99)) if latencies.size else float('nan'),
+                'batch_sizes': dict(sorted(self.batch_sizes.items()))}
+
+    def format_stats(self):
+        """ Format stats as text, the batch sizes are grouped in powers of 2 """
+        stats = self.get_stats()
+        histogram = collections.Counter()
+        for size, count in stats['batch_sizes'].items():
+            histogram[1 << (size - 1).bit_length()] += count
+        lines = ["requests=%i p50=%.3f ms p99=%.3f ms" % (stats['n_requests'], stats['p50_ms'], stats['p99_ms'])]
+        lines += ["  batch size <= %5i: %i batches" % (size, count) for size, count in sorted(histogram.items())]
+        return '\n'.join(lines)
+
+
+class PolicyClient:
+    """ Client of the policy server. Requests can be made concurrently on one connection """
+
+    def __init__(self, n_input=24):
+        self.n_input = n_input
+        self._reader = None
+        self._writer = None
+        self._pending = {}
+        self._next_request_id = 0
+        self._read_task = None
+        self._drain_lock = None
+
+    async def connect(self, host='127.0.0.1', port=8765, unix_socket=None):
+        """ Connect to the policy server, on a unix socket when given, otherwise on host and port """
+        if unix_socket is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(unix_socket)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._drain_lock = asyncio.Lock()
+        self._read_task = asyncio.ensure_future(self._read_responses())
+
+    async def _read_responses(self):
+        try:
+            while True:
+                request_id, decision = RESPONSE.unpack(await self._reader.readexactly(RESPONSE.size))
+                future = self._pending.pop(request_id)
+                if decision == INVALID_REQUEST:
+                    future.set_exception(ValueError("Request %i is invalid, e.g. the model does not exist" %
+                                                    request_id))
+                else:
+                    future.set_result(decision)
+        except (asyncio.IncompleteReadError, ConnectionError) as error:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def decide(self, vision, model=0):
+        """ Get decision of a model
+
+        Args:
+            vision (np.array): vision of the snake, see Snake.get_vision
+            model (int): index of the model
+
+        Returns:
+            str: direction; 'left', 'right', 'up' or 'down'
+        """
+        request_id = self._next_request_id
+        self._next_request_id = (self._next_request_id + 1) % 2**32
+        future = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = future
+
+        vision = np.asarray(vision, dtype='<f8').reshape(self.n_input)
+        self._writer.write(REQUEST_HEADER.pack(request_id, model) + vision.tobytes())
+        async with self._drain_lock:
+            await self._writer.drain()
+        return DECISIONS[await future]
+
+    def close(self):
+        """ Close connection """
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def load_models(genome_paths=(), archive_path=None, generations=()):
+    """ Load DNA of models from genome files and generations of an archive
+
+    Args:
+        genome_paths (list): paths to genome files, each genome in a file is a model
+        archive_path (str): path to archive
+        generations (list): generations of the archive that are models
+
+    Returns:
+        np.array: n_models by n_genes array with the DNA of each model
+    """
+    from functions.genome_archive import GenomeArchive
+    from functions.genome_file import load_genomes
+
+    dna = [np.asarray(load_genomes(path)[1]) for path in genome_paths]
+    if archive_path is not None:
+        archive = GenomeArchive(archive_path, mode='r')
+        dna += [np.asarray(archive.get_dna(generation)).reshape(1, -1) for generation in generations]
+    if not dna:
+        raise ValueError("No models given")
+    return np.concatenate(dna, axis=0)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Serve decisions of trained snakes to many clients")
+    parser.add_argument('--genome', nargs='*', default=[], help="genome files, each genome is a model")
+    parser.add_argument('--archive', help="genome archive")
+    parser.add_argument('--generations', nargs='*', type=int, default=[], help="generations of the archive to serve")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help="listen on a unix socket instead of host and port")
+    parser.add_argument('--batch-window', type=float, default=0.001, help="seconds to wait for more requests")
+    parser.add_argument('--max-batch-size', type=int, default=1024)
+    parser.add_argument('--stats-interval', type=float, default=10, help="seconds between printing stats")
+    args = parser.parse_args(args)
+
+    server = PolicyServer(load_models(args.genome, args.archive, args.generations), batch_window=args.batch_window,
+                          max_batch_size=args.max_batch_size)
+
+    # the event loop is created and closed explicitly, so the server also runs on Python 3.6 (see Dockerfile)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    listener = loop.run_until_complete(server.start(args.host, args.port, args.unix_socket))
+    print("Serving %i models on %s" % (server.dna.shape[0], args.unix_socket or '%s:%i' % (args.host, args.port)))
+    try:
+        while True:
+            loop.run_until_complete(asyncio.sleep(args.stats_interval))
+            print(server.format_stats())
+    except KeyboardInterrupt:
+        print(server.format_stats())
+    finally:
+        listener.close()
+        loop.run_until_complete(server.stop())
+        loop.run_until_complete(listener.wait_closed())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+""" Random numbers of the optimizers. Each random part of a generation (DNA initialization, choice of parents, mutations
+and perturbations) draws from its own np.random.Generator, derived with np.random.SeedSequence from the seed of the
+training session, the generation, the part and a block of individuals. The random numbers of an individual therefore
+only depend on the seed, the generation and its index in the population, not on the global np.random state, the backend
+or how the population is divided in chunks or over processes. Training with the same seed therefore gives the same
+results with every backend, number of processes and chunk size, and with the population of the genetic algorithm in
+memory or on disk. This is checked by profiling/check_reproducibility.py.
+"""
+import numpy as np
+
+# random parts of a generation, each part has its own streams
+STREAMS = ('dna', 'parent', 'mutation', 'perturbation')
+
+# number of individuals that draw from the same stream
+BLOCK_SIZE = 1024
+
+
+def get_seed(seed=None):
+    """ Get the seed of a training session
+
+    Args:
+        seed (int): seed. When None a new seed is generated from the entropy of the operating system
+
+    Returns:
+        int: seed, save it to repeat the training session
+    """
+    return np.random.SeedSequence(seed).entropy
+
+
+def get_rng(seed, generation, stream, block=0):
+    """ Get the random generator of a part of a generation
+
+    Args:
+        seed (int): seed of the training session
+        generation (int): generation
+        stream (str): random part of the generation, see STREAMS
+        block (int): block of BLOCK_SIZE individuals
+
+    Returns:
+        np.random.Generator: random generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(generation, STREAMS.index(stream), block)))
+
+
+def draw(seed, generation, stream, start, stop, draw_block):
+    """ Draw random values for a range of individuals. The values of each block are drawn at once and the values of
+        the individuals in the range are selected, so the values of an individual do not depend on the range
+
+    Args:
+        seed (int): seed of the training session
+        generation (int): generation
+        stream (str): random part of the generation, see STREAMS
+        start (int): index of the first individual
+        stop (int): index after the last individual
+        draw_block (callable): function of a random generator and the number of individuals that returns an array
+            with a row for each individual
+
+    Returns:
+        np.array: random values with a row for each individual in the range
+    """
+    values = []
+    for block in range(start // BLOCK_SIZE, -(-stop // BLOCK_SIZE)):
+        block_start = block * BLOCK_SIZE
+        block_values = draw_block(get_rng(seed, generation, stream, block), BLOCK_SIZE)
+        values.append(block_values[max(start, block_start) - block_start:min(stop, block_start + BLOCK_SIZE) -
+                                   block_start])
+    if not values:
+        return draw_block(get_rng(seed, generation, stream), 0)
+    return np.concatenate(values)
+
+
+def random_dna(seed, start, stop, n_genes, generation=0):
+    """ Draw random DNA values between -1 and 1 for a range of individuals
+
+    Args:
+        seed (int): seed of the training session
+        start (int): index of the first individual
+        stop (int): index after the last individual
+        n_genes (int): number of genes
+        generation (int): generation
+
+    Returns:
+        np.array: stop - start by n_genes array with DNA values
+    """
+    return draw(seed, generation, 'dna', start, stop, lambda rng, n: rng.random((n, n_genes)) * 2 - 1)
+
+
+def draw_children(seed, generation, start, stop, n_parents, n_genes, mutation_rate):
+    """ Draw the random values of a range of children; parent and mutation
+
+    Args:
+        seed (int): seed of the training session
+        generation (int): generation of the children
+        start (int): index of the first child
+        stop (int): index after the last child
+        n_parents (int): number of snakes that may be parents
+        n_genes (int): number of genes
+        mutation_rate (float): probability that a gene is mutated
+
+    Returns:
+        tuple: tuple containing 2 elements, each an array with a row for each child:
+            1) index of the parent
+            2) mutation of each gene; a value from a gaussian distribution (mean=0, std=0.5) for genes that are
+               mutated, otherwise 0
+    """
+    parents = draw(seed, generation, 'parent', start, stop, lambda rng, n: rng.integers(n_parents, size=n))
+    mutations = draw(seed, generation, 'mutation', start, stop,
+                     lambda rng, n: np.where(rng.random((n, n_genes)) <= mutation_rate,
+                                             rng.normal(scale=0.5, size=(n, n_genes)), 0))
+    return parents, mutations
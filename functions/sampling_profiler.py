@@ -0,0 +1,171 @@
+""" Low overhead sampling profiler. A background thread takes a snapshot of the call stack of the profiled thread at a
+fixed interval, instead of tracing every function call like cProfile. The samples are stored as collapsed stacks
+(one line per stack: 'frame;frame;frame count'), the input format of flamegraph tools like flamegraph.pl and
+speedscope.
+
+Processes that play games for the genetic algorithm (joblib workers) are profiled when the environment variable
+SNAKE_SAMPLING_PROFILE_DIR is set, see profile_worker. Each worker appends its samples to a file in that folder.
+"""
+import collections
+import contextlib
+import os
+import sys
+import threading
+
+# folder the workers write their samples to. When not set the workers are not profiled
+SAMPLING_PROFILE_DIR_ENV = 'SNAKE_SAMPLING_PROFILE_DIR'
+SAMPLING_INTERVAL_ENV = 'SNAKE_SAMPLING_INTERVAL'
+
+# process that is already being profiled, nested profile_worker calls in this process do nothing
+_profiled_process_id = None
+
+
+class SamplingProfiler:
+    """ Sample the call stack of a thread
+
+    Attributes:
+        interval (float): time in seconds between samples
+        thread_id (int): identifier of the profiled thread
+        samples (collections.Counter): number of samples of each collapsed stack
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = collections.Counter()
+
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_label(self, code):
+        """ Get frame label of a code object; file name without extension and function name """
+        label = self._labels.get(code)
+        if label is None:
+            file_name = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = ('%s:%s' % (file_name, code.co_name)).replace(' ', '_').replace(';', '_')
+            self._labels[code] = label
+        return label
+
+    def sample(self):
+        """ Add a sample of the current call stack of the profiled thread """
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(self.get_label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """ Start sampling in a background thread """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop sampling """
+        self._stop.set()
+        self._thread.join()
+
+
+def read_collapsed(path):
+    """ Read collapsed stacks
+
+    Args:
+        path (str): path to file with collapsed stacks
+
+    Returns:
+        collections.Counter: number of samples of each stack
+    """
+    samples = collections.Counter()
+    with open(path) as file:
+        for line in file:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+
+def write_collapsed(path, samples, mode='w'):
+    """ Write collapsed stacks
+
+    Args:
+        path (str): path to file
+        samples (collections.Counter): number of samples of each stack
+        mode (str): 'w' to overwrite the file, 'a' to append to the file
+    """
+    with open(path, mode) as file:
+        file.writelines('%s %i\n' % (stack, count) for stack, count in sorted(samples.items()))
+
+
+def merge_collapsed(paths, prefix=None):
+    """ Merge collapsed stacks of several files
+
+    Args:
+        paths (list): paths to files with collapsed stacks
+        prefix (str): frame that is added to the root of each stack, e.g. to separate workers from the main process
+
+    Returns:
+        collections.Counter: number of samples of each stack
+    """
+    samples = collections.Counter()
+    for path in paths:
+        for stack, count in read_collapsed(path).items():
+            samples[stack if prefix is None else '%s;%s' % (prefix, stack)] += count
+    return samples
+
+
+def get_function_samples(samples):
+    """ Count the samples per function
+
+    Args:
+        samples (collections.Counter): number of samples of each collapsed stack
+
+    Returns:
+        tuple: two collections.Counter's with the number of samples per function; samples in which the function itself
+            was running (self) and samples in which the function was on the stack (total)
+    """
+    self_samples, total_samples = collections.Counter(), collections.Counter()
+    for stack, count in samples.items():
+        frames = stack.split(';')
+        self_samples[frames[-1]] += count
+        for frame in set(frames):
+            total_samples[frame] += count
+    return self_samples, total_samples
+
+
+def set_profiled_process(process_id):
+    """ Mark a process as profiled, so profile_worker does not profile it a second time
+
+    Args:
+        process_id (int): process id, None when no process is profiled anymore
+    """
+    global _profiled_process_id
+    _profiled_process_id = process_id
+
+
+@contextlib.contextmanager
+def profile_worker():
+    """ Profile the games played in a worker process when SNAKE_SAMPLING_PROFILE_DIR is set. The samples are appended
+        to worker-<process id>.collapsed in that folder. Does nothing in a process that is already profiled, like the
+        main process profiled by profiling.profile_code.sampling_profile.
+    """
+    folder = os.environ.get(SAMPLING_PROFILE_DIR_ENV)
+    if not folder or os.getpid() == _profiled_process_id:
+        yield
+        return
+
+    profiler = SamplingProfiler(float(os.environ.get(SAMPLING_INTERVAL_ENV, 0.005)))
+    set_profiled_process(os.getpid())
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        set_profiled_process(None)
+        write_collapsed(os.path.join(folder, 'worker-%i.collapsed' % os.getpid()), profiler.samples, mode='a')
@@ -1,8 +1,26 @@
 import numpy as np
 
-from functions.snake_board import SnakeBoard
+from functions.snake_board import SnakeBoard, get_vision_tables
 from functions.brain import Brain
 
+# ways a snake can die, see Snake.snake_alive
+DEATH_CAUSES = ('wall', 'body', 'starvation')
+
+
+def calculate_fitness(moves_played, total_apples_found):
+    """ Calculate fitness of a snake
+
+    Args:
+        moves_played (int): Number of moves played before the snake died
+        total_apples_found (int): Total number of apples found
+
+    Returns:
+        float: Fitness of the snake
+    """
+    return moves_played \
+        + ((2**total_apples_found) + 500 * (total_apples_found**2.1)) \
+        - ((0.25 * moves_played)**1.3 * (total_apples_found**1.2))
+
 
 class Snake(SnakeBoard, Brain):
     """ Generate new snake. This class inherits from two parent classes:
@@ -22,14 +40,18 @@ class Snake(SnakeBoard, Brain):
         total_snake_length (int): Total length of the snake
         apple_found (bool): True if the snake has found an apple
         total_apples_found (int): Total number of apples found
+        death_cause (str): How the snake died; 'wall', 'body' or 'starvation'. None while the snake is alive
+        moves (list): Decision (index of decisions) of each move. None when the moves are not recorded
+        apple_moves (list): Number of moves played when each apple was found. None when the moves are not recorded
     """
 
-    def __init__(self):
-        SnakeBoard.__init__(self)
-        Brain.__init__(self)
+    def __init__(self, grid_size=10, apple_seed=2, dna=None):
+        SnakeBoard.__init__(self, grid_size, apple_seed)
+        Brain.__init__(self, dna)
 
-        self.snake_head = np.asarray([[5, 5]])
-        self.snake_body = np.asarray([[5, 4], [5, 3]])
+        center = self.grid_size // 2
+        self.snake_head = np.asarray([[center, center]])
+        self.snake_body = np.asarray([[center, center - 1], [center, center - 2]])
         self.fitness = 0
         self.alive = True
         self.moves_played = 0
@@ -39,11 +61,15 @@ class Snake(SnakeBoard, Brain):
         self.total_snake_length = 3
         self.apple_found = False
         self.total_apples_found = 0
+        self.death_cause = None
+        self.moves = None
+        self.apple_moves = None
 
     def reset_snake(self):
         """ Reset snakes initial values"""
-        self.snake_head = np.asarray([[5, 5]])
-        self.snake_body = np.asarray([[5, 4], [5, 3]])
+        center = self.grid_size // 2
+        self.snake_head = np.asarray([[center, center]])
+        self.snake_body = np.asarray([[center, center - 1], [center, center - 2]])
         self.fitness = 0
         self.alive = True
         self.moves_played = 0
@@ -52,9 +78,17 @@ class Snake(SnakeBoard, Brain):
         self.total_snake_length = 3
         self.apple_found = False
         self.total_apples_found = 0
+        self.death_cause = None
+        if self.moves is not None:
+            self.start_recording()
         self.n_apples = 0
         self.get_new_apple()
 
+    def start_recording(self):
+        """ Record the moves of the next game and the moves at which apples are found """
+        self.moves = []
+        self.apple_moves = []
+
     def snake_move(self):
         self.make_decision()
 
@@ -65,8 +99,10 @@ class Snake(SnakeBoard, Brain):
     def make_decision(self):
         """ Change the direction of the snake
         """
-        A3 = self.forward_propagation(self.get_vision())
-        self.direction = self.decisions[np.argmax(A3)]
+        decision = np.argmax(self.forward_propagation(self.get_vision()))
+        self.direction = self.decisions[decision]
+        if self.moves is not None:
+            self.moves.append(decision)
 
     def snake_alive(self):
         """ Determine if the snake is alive or not. The snake can die in 3 different ways:
@@ -76,10 +112,13 @@ class Snake(SnakeBoard, Brain):
         """
         if np.any(self.snake_head == -1) or np.any(self.snake_head == self.grid_size):
             self.alive = False
-        if np.any(np.all(self.snake_head == self.snake_body, axis=1)):
+            self.death_cause = 'wall'
+        elif np.any(np.all(self.snake_head == self.snake_body, axis=1)):
             self.alive = False
-        if self.moves_without_apple > self.grid_size**2:
+            self.death_cause = 'body'
+        elif self.moves_without_apple > self.grid_size**2:
             self.alive = False
+            self.death_cause = 'starvation'
 
         if not self.alive:
             self.determine_fitness()
@@ -90,9 +129,7 @@ class Snake(SnakeBoard, Brain):
         # 1. Reward snakes early on for exploration + finding a couple apples.
         # 2. Have an increasing reward for snakes as they find more apples.
         # 3. Penalize snakes for taking a lot of steps.Putting those rules into code looks something like this
-        self.fitness = self.moves_played \
-                       + ((2**self.total_apples_found) + 500 * (self.total_apples_found**2.1)) \
-                       - ((0.25 * self.moves_played)**1.3 * (self.total_apples_found**1.2))
+        self.fitness = calculate_fitness(self.moves_played, self.total_apples_found)
 
     def found_apple(self):
         """ Determine if snake has found an apple. If found set apple_found to True, increase number of apple founds,
@@ -101,6 +138,8 @@ class Snake(SnakeBoard, Brain):
         if np.all(self.snake_head == self.apple):
             self.apple_found = True
             self.total_apples_found += 1
+            if self.apple_moves is not None:
+                self.apple_moves.append(self.moves_played)
             self.get_new_apple()
             self.moves_without_apple = 0
 
@@ -180,11 +219,8 @@ class Snake(SnakeBoard, Brain):
             np.array: contains 8 binary elements. If 1, than a body part is near in that direction
         """
         body_diff = self.snake_body - self.snake_head
-        coordinates_around_head = np.asarray([(i_row, i_col) for i_row in [-1, 0, 1]
-                                                             for i_col in [-1, 0, 1]
-                                                             if not (i_row == 0 and i_col == 0)])
-        body_in_sight = np.asarray([np.any(np.all(body_diff == coordinates, axis=1))
-                                    for coordinates in coordinates_around_head])
+        coordinates_around_head = get_vision_tables(self.grid_size)['neighbours']
+        body_in_sight = np.any(np.all(body_diff[None, :, :] == coordinates_around_head[:, None, :], axis=2), axis=1)
 
         return body_in_sight
 
@@ -194,12 +230,7 @@ class Snake(SnakeBoard, Brain):
         Returns:
             np.array: contains 8 values between 0 and 1. If 1 the edge is near, if 0 the edge is as far away as possible
         """
-        size = (self.grid_size - 1)
-        edge_left = 1 - (self.snake_head[0, 1] / size)
-        edge_right = 1 - ((size - self.snake_head[0, 1]) / size)
-        edge_up = 1 - (self.snake_head[0, 0] / size)
-        edge_down = 1 - ((size - self.snake_head[0, 0]) / size)
-        return np.asarray([edge_left, edge_right, edge_up, edge_down])
+        return get_vision_tables(self.grid_size)['edge'][self.snake_head[0, 0], self.snake_head[0, 1]]
 
     def get_apple_vision(self):
         """Determine if the snake can see the apple in 8 directions
@@ -207,23 +238,5 @@ class Snake(SnakeBoard, Brain):
         Returns:
             np.array: contains 8 binary values. If 1 the snake can see apple in that direction. Otherwise 0.
         """
-        apple_diff = self.snake_head - self.apple
-        apple_in_sight = np.zeros((1, 8))
-        if apple_diff[0, 0] == 0 and apple_diff[0, 1] > 0:
-            apple_in_sight[0, 0] = 1
-        elif apple_diff[0, 0] == 0 and apple_diff[0, 1] < 0:
-            apple_in_sight[0, 1] = 1
-        elif apple_diff[0, 1] == 0 and apple_diff[0, 1] > 0:
-            apple_in_sight[0, 2] = 1
-        elif apple_diff[0, 1] == 0 and apple_diff[0, 1] < 0:
-            apple_in_sight[0, 3] = 1
-        elif abs(apple_diff[0, 0]) == abs(apple_diff[0, 1]) and apple_diff[0, 0] < 0:
-            apple_in_sight[0, 4] = 1
-        elif abs(apple_diff[0, 0]) == abs(apple_diff[0, 1]) and apple_diff[0, 0] > 0:
-            apple_in_sight[0, 5] = 1
-        elif abs(apple_diff[0, 0]) == abs(apple_diff[0, 1]) and apple_diff[0, 1] < 0:
-            apple_in_sight[0, 6] = 1
-        elif abs(apple_diff[0, 0]) == abs(apple_diff[0, 1]) and apple_diff[0, 1] > 0:
-            apple_in_sight[0, 7] = 1
-
-        return apple_in_sight
+        apple_diff = self.snake_head - self.apple + (self.grid_size - 1)
+        return get_vision_tables(self.grid_size)['apple'][apple_diff[0, 0], apple_diff[0, 1]].reshape(1, 8)
@@ -1,18 +1,139 @@
+from functools import lru_cache
+
 import numpy as np
 
+# coordinates around the head, in the order of the body vision of the snake
+NEIGHBOURS = np.asarray([(i_row, i_col) for i_row in [-1, 0, 1]
+                                        for i_col in [-1, 0, 1]
+                                        if not (i_row == 0 and i_col == 0)])
+
+# smallest grid the initial snake fits on, with room to move
+MIN_GRID_SIZE = 5
+
+
+def check_grid_size(grid_size):
+    """ Raise ValueError when the grid is too small to play on
+
+    Args:
+        grid_size (int): Size of the grid
+    """
+    if grid_size < MIN_GRID_SIZE:
+        raise ValueError("Grid size %s is too small, the minimum grid size is %i" % (grid_size, MIN_GRID_SIZE))
+
+
+def classify_apple_direction(row_diff, col_diff):
+    """ Determine in which of 8 directions the apple can be seen from the head
+
+    Args:
+        row_diff (int): row of the head minus row of the apple
+        col_diff (int): column of the head minus column of the apple
+
+    Returns:
+        np.array: contains 8 binary values. If 1 the snake can see apple in that direction. Otherwise 0.
+    """
+    apple_in_sight = np.zeros(8)
+    if row_diff == 0 and col_diff > 0:
+        apple_in_sight[0] = 1
+    elif row_diff == 0 and col_diff < 0:
+        apple_in_sight[1] = 1
+    elif col_diff == 0 and col_diff > 0:
+        apple_in_sight[2] = 1
+    elif col_diff == 0 and col_diff < 0:
+        apple_in_sight[3] = 1
+    elif abs(row_diff) == abs(col_diff) and row_diff < 0:
+        apple_in_sight[4] = 1
+    elif abs(row_diff) == abs(col_diff) and row_diff > 0:
+        apple_in_sight[5] = 1
+    elif abs(row_diff) == abs(col_diff) and col_diff < 0:
+        apple_in_sight[6] = 1
+    elif abs(row_diff) == abs(col_diff) and col_diff > 0:
+        apple_in_sight[7] = 1
+    return apple_in_sight
+
+
+# random state of the apples, reseeded for each board. Creating a new random state for each snake is slow
+_apple_random_state = np.random.RandomState()
+
+
+def generate_apples(grid_size, apple_seed=2, random_state=None):
+    """ Generate the locations of the apples that will appear in a game
+
+    Args:
+        grid_size (int): Size of the grid
+        apple_seed (int): Seed of the apple locations. The default seed gives the apples the snakes are trained on
+        random_state (np.random.RandomState): random state that is reseeded with the apple seed. When None a random
+            state of this module is used. Reseeding is much faster than creating a new random state
+
+    Returns:
+        np.array: grid_size**2 by 2 array with the location of the apples
+    """
+    random_state = random_state or _apple_random_state
+    random_state.seed(apple_seed)
+    return random_state.randint(0, grid_size, size=(grid_size**2, 2))
+
+
+@lru_cache(maxsize=128)
+def get_board_apples(grid_size, apple_seed=2):
+    """ Get the apples of a board. All boards with the same grid size and seed share the same read only array, so
+        the apples are not stored again for each snake in the population
+
+    Args:
+        grid_size (int): Size of the grid
+        apple_seed (int): Seed of the apple locations
+
+    Returns:
+        np.array: grid_size**2 by 2 array with the location of the apples
+    """
+    apples = generate_apples(grid_size, apple_seed)
+    apples.flags.writeable = False
+    return apples
+
+
+@lru_cache(maxsize=None)
+def get_vision_tables(grid_size):
+    """ Precompute the vision of the snake that only depends on the position of the head and the apple. The tables
+        are computed once per grid size, so the snake only has to look up its vision during the game.
+
+    Args:
+        grid_size (int): Size of the grid
+
+    Returns:
+        dict: tables with
+            edge (np.array): grid_size by grid_size by 4 array with the distance to the edges in four directions for
+                each cell. Values between 0 and 1. If 1 the edge is near, if 0 the edge is as far away as possible
+            apple (np.array): (2*grid_size-1) by (2*grid_size-1) by 8 array with the apple vision for each difference
+                between head and apple. Index [row_diff + grid_size - 1, col_diff + grid_size - 1]
+            neighbours (np.array): 8 by 2 array with the coordinates around the head
+    """
+    check_grid_size(grid_size)
+    size = (grid_size - 1)
+    rows, cols = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing='ij')
+    edge = np.stack([1 - (cols / size), 1 - ((size - cols) / size), 1 - (rows / size), 1 - ((size - rows) / size)],
+                    axis=2)
+
+    diffs = range(-size, size + 1)
+    apple = np.asarray([[classify_apple_direction(row_diff, col_diff) for col_diff in diffs] for row_diff in diffs])
+
+    for table in (edge, apple):
+        table.flags.writeable = False
+    return {'edge': edge, 'apple': apple, 'neighbours': NEIGHBOURS}
+
 
 class SnakeBoard:
     """ Snake board
 
     Attributes:
         grid_size (int): Size of the grid
+        apple_seed (int): Seed of the apples that will appear in the game
         n_apples (int): Number of apples found
         apples (list): List of apples that will appear in the game
         apple (np.array): Location of the current apple. x and y coordinates of the grid.
     """
 
-    def __init__(self):
-        self.grid_size = 10
+    def __init__(self, grid_size=10, apple_seed=2):
+        check_grid_size(grid_size)
+        self.grid_size = grid_size
+        self.apple_seed = apple_seed
         self.n_apples = 0
         self.apples = self.generate_apples()
         self.apple = 0
@@ -24,10 +145,7 @@ class SnakeBoard:
         Returns:
             list: List with the location of the apples that will appear in the game
         """
-        np.random.seed(2)
-        apples = np.random.randint(0, self.grid_size, size=(self.grid_size**2, 2))
-        np.random.seed(None)
-        return apples
+        return get_board_apples(self.grid_size, self.apple_seed)
 
     def get_new_apple(self):
         """ Get new apple from list of apples
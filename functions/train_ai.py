@@ -1,11 +1,80 @@
+import json
 import os
-import pickle
 
+from functions.evolution_strategies import EvolutionStrategies
 from functions.genetic_algorithm import GeneticAlgorithm
-from default import file_name_intermediate_results
+from functions.out_of_core import OutOfCoreGeneticAlgorithm
+from functions.genome_archive import ARCHIVE_FILE_NAME, GenomeArchive
+from functions.genome_file import get_n_genes, get_topology, load_genomes
+from functions.memory_monitor import MB, MemoryMonitor, estimate_game_bytes
+from functions.move_log import get_move_log_name
+from functions.training_controller import TrainingController
+from default import file_name_intermediate_results, file_name_checkpoint, file_name_checkpoint_state, \
+    file_name_memory_usage, file_name_controller_events, folder_name_move_logs
 
+# optimizers that can train the snakes by name; genetic algorithm, genetic algorithm with the population on disk and
+# evolution strategies
+OPTIMIZERS = {'ga': GeneticAlgorithm,
+              'ga_out_of_core': OutOfCoreGeneticAlgorithm,
+              'es': EvolutionStrategies}
 
-def start_genetic_algorithm(output_folder, n_generations, population_size, survival_perc, parent_perc, mutation_perc):
+
+def save_checkpoint_state(path, generation, state):
+    """ Save the state of training that is not in the checkpoint genome file. The file is first written to a temporary
+        file and then moved, so a half written file is never read
+
+    Args:
+        path (str): path to JSON file
+        generation (int): generation of the checkpoint
+        state (dict): state, e.g. of the optimizer, with values that can be saved as JSON
+    """
+    with open(path + '.tmp', 'w') as file:
+        json.dump(dict(state, generation=generation), file)
+    os.replace(path + '.tmp', path)
+
+
+def load_checkpoint_state(path, generation):
+    """ Load the state of training saved with the checkpoint of a generation
+
+    Args:
+        path (str): path to JSON file
+        generation (int): generation of the checkpoint
+
+    Returns:
+        dict: state. Empty when there is no state of this generation, e.g. checkpoints of older versions
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        state = json.load(file)
+    return state if state.pop('generation') == generation else {}
+
+
+def truncate_csv(path, generation):
+    """ Remove the rows of the generations after a generation from a csv file with the generation in the first column,
+        e.g. when training is resumed from a checkpoint of that generation and the later generations are trained again
+
+    Args:
+        path (str): path to csv file
+        generation (int): last generation that is kept
+    """
+    if not os.path.exists(path):
+        return
+    with open(path) as file:
+        lines = file.readlines()
+    kept = lines[:1] + [line for line in lines[1:] if int(line.split(',', 1)[0]) <= generation]
+    if len(kept) < len(lines):
+        with open(path + '.tmp', 'w') as file:
+            file.writelines(kept)
+        os.replace(path + '.tmp', path)
+
+
+def start_genetic_algorithm(output_folder, n_generations, population_size, survival_perc, parent_perc, mutation_perc,
+                            grid_size=10, backend='joblib', n_jobs=None, checkpoint_every=0, resume=False,
+                            chunk_size=None, memory_budget=None, trace_memory=False, optimizer='ga', es_sigma=0.5,
+                            es_learning_rate=0.1, seed=None, patience=0, min_delta=0, plateau_metric='best_score',
+                            adapt_population=False, min_population_size=None, max_population_size=None,
+                            record_moves=False):
     """ Start genetic algorithm and save best snake in each population and write intermediate results to file
 
     Args:
@@ -16,13 +85,71 @@ def start_genetic_algorithm(output_folder, n_generations, population_size, survi
         survival_perc (int): survival percentage. Value between 0 and 100
         parent_perc (int): parent percentage. Value between 0 and 100
         mutation_perc (int): mutation percentage. Value between 0 and 100
+        grid_size (int): size of the grid the snakes play on
+        backend (str): backend used to play the games; 'serial', 'joblib' or 'vectorized'
+        n_jobs (int): number of processes used by the joblib backend. When None all computer cores are used
+        checkpoint_every (int): save the population every checkpoint_every generations and after the last generation.
+            When 0 no checkpoints are saved
+        resume (bool): when True and a checkpoint exists in the output folder, continue from the checkpoint
+        chunk_size (int): when given, the population is kept in a genome file in the output folder instead of in
+            memory and the games are played in chunks of chunk_size snakes, see OutOfCoreGeneticAlgorithm
+        memory_budget (float): maximum memory in MB of the training process and its workers. When the games of the
+            population would not fit, fewer games are played at the same time. When None there is no maximum
+        trace_memory (bool): when True the Python allocations are traced with tracemalloc, which slows down training
+        optimizer (str): name of the optimizer in OPTIMIZERS; 'ga' for GeneticAlgorithm or 'es' for
+            EvolutionStrategies. With chunk_size 'ga' is OutOfCoreGeneticAlgorithm. The survival, parent and mutation
+            percentages are only used by 'ga', es_sigma and es_learning_rate only by 'es'
+        es_sigma (float): standard deviation of the perturbations of EvolutionStrategies
+        es_learning_rate (float): learning rate of EvolutionStrategies
+        seed (int): seed of the random numbers of the optimizer, see functions.random_streams. The same seed gives
+            the same results with every backend, number of processes and chunk size, and after resuming from a
+            checkpoint, see profiling/check_reproducibility.py. When None a new seed is generated
+        patience (int): stop when plateau_metric has not improved for patience generations. When 0 all generations
+            are trained
+        min_delta (float): minimum increase of plateau_metric that counts as improvement
+        plateau_metric (str): stat used to detect a plateau; 'best_score', 'best_fitness', 'population_score' or
+            'population_fitness'
+        adapt_population (bool): when True the population grows when training stagnates and shrinks when it improves
+            quickly, see TrainingController
+        min_population_size (int): minimum population size when adapt_population is True. Default is a quarter of
+            population_size, but at least the smallest population size of the optimizer, e.g. the genetic algorithm
+            needs at least one parent and, when survival_perc is above 0, one survivor. ValueError is raised when
+            population_size, min_population_size or max_population_size is smaller
+        max_population_size (int): maximum population size when adapt_population is True. Default is four times
+            population_size
+        record_moves (bool): when True the moves of every game are saved to a move log file per generation in the
+            move logs folder of the output folder, see functions.move_log. Only supported by optimizer ga without
+            chunk_size
+
+    Returns:
+        Optimizer: optimizer with the population of the last generation
     """
+    # the population of the genetic algorithm is kept on disk when a chunk size is given
+    if optimizer == 'ga' and chunk_size:
+        optimizer = 'ga_out_of_core'
+    if optimizer not in OPTIMIZERS:
+        raise ValueError("Optimizer %s is not supported, choose one of %s" % (optimizer, ', '.join(OPTIMIZERS)))
+    if optimizer == 'es' and chunk_size:
+        raise ValueError("Optimizer es keeps a single genome in memory, chunk_size is only supported by optimizer ga")
+    if record_moves and not OPTIMIZERS[optimizer].supports_move_logs:
+        raise ValueError("Moves can only be recorded by optimizer ga when the population is kept in memory")
 
     # scale percentage values to values between 0 and 1
     survival_perc /= 100
     parent_perc /= 100
     mutation_perc /= 100
 
+    # the population must be large enough for the optimizer, e.g. the genetic algorithm needs at least one parent
+    settings = {'survival_perc': survival_perc, 'parent_perc': parent_perc, 'mutation_rate': mutation_perc,
+                'grid_size': grid_size, 'backend': backend, 'n_jobs': n_jobs, 'seed': seed, 'chunk_size': chunk_size,
+                'record_moves': record_moves, 'es_sigma': es_sigma, 'es_learning_rate': es_learning_rate}
+    smallest_population_size = OPTIMIZERS[optimizer].get_min_population_size(settings)
+    for name, size in (('Population size', population_size), ('Minimum population size', min_population_size),
+                       ('Maximum population size', max_population_size)):
+        if size is not None and size < smallest_population_size:
+            raise ValueError("%s %i is too small for optimizer %s with these settings, the minimum is %i" %
+                             (name, size, optimizer, smallest_population_size))
+
     # Create file to save intermediate results
     intermediate_results_path = "%s/%s" % (output_folder, file_name_intermediate_results)
     # if file does not exist create one and add header
@@ -31,12 +158,53 @@ def start_genetic_algorithm(output_folder, n_generations, population_size, survi
         with open(intermediate_results_path, "a") as file:
             file.write(headers)
 
-    # initialize genetic algorithm and create random population
-    population = GeneticAlgorithm(population_size, survival_perc, parent_perc, mutation_perc)
-    for generation in range(n_generations):
+    # memory usage of each phase of a generation
+    memory_monitor = MemoryMonitor(os.path.join(output_folder, file_name_memory_usage),
+                                   None if memory_budget is None else memory_budget * MB, trace_memory)
+
+    # decides to stop early or resize the population, the decisions are written to the controller events file
+    controller = TrainingController(plateau_metric, patience, min_delta, adapt_population,
+                                    min_population_size or max(smallest_population_size, population_size // 4),
+                                    max_population_size or population_size * 4,
+                                    output_path=os.path.join(output_folder, file_name_controller_events))
+
+    # folder to save the moves of every game of each generation
+    move_logs_folder = os.path.join(output_folder, folder_name_move_logs)
+    if record_moves and not os.path.isdir(move_logs_folder):
+        os.makedirs(move_logs_folder)
 
-        # for each snake in the population play the game
-        population.play_games(parallel=True)
+    # archive to save the best snake of each generation
+    archive = GenomeArchive(os.path.join(output_folder, ARCHIVE_FILE_NAME), grid_size=grid_size)
+
+    # initialize optimizer and create random population
+    population = OPTIMIZERS[optimizer].from_settings(population_size, output_folder, settings)
+
+    # continue with the population and the state of the optimizer of the last checkpoint. The generations after the
+    # checkpoint are trained again, so their results are removed
+    checkpoint_path = os.path.join(output_folder, file_name_checkpoint)
+    checkpoint_state_path = os.path.join(output_folder, file_name_checkpoint_state)
+    first_generation = 0
+    if resume and os.path.exists(checkpoint_path):
+        header, dna = load_genomes(checkpoint_path)
+        first_generation = header['generation']
+        state = load_checkpoint_state(checkpoint_state_path, first_generation)
+        if 'optimizer' in state:
+            population.set_state(state['optimizer'])
+        if 'controller' in state:
+            controller.set_state(state['controller'])
+        population.load_population(dna, first_generation)
+        archive.truncate(first_generation)
+        truncate_csv(intermediate_results_path, first_generation)
+        truncate_csv(controller.output_path, first_generation)
+
+    game_bytes = estimate_game_bytes('out_of_core' if chunk_size else 'vectorized' if optimizer == 'es' else backend,
+                                     grid_size, get_n_genes(get_topology()))
+    for generation in range(first_generation, n_generations):
+
+        # for each snake in the population play the game, fewer at the same time when they don't fit in the budget
+        evaluation_chunk_size = memory_monitor.get_chunk_size(len(population), game_bytes)
+        with memory_monitor.phase('play_games', generation+1, len(population), evaluation_chunk_size):
+            population.play_games(parallel=True, chunk_size=evaluation_chunk_size)
 
         # get fitness and number of apples found for the entire population and best snake
         population_fitness = population.get_population_fitness()
@@ -46,9 +214,13 @@ def start_genetic_algorithm(output_folder, n_generations, population_size, survi
 
         # get best snake and save
         best_snake = population.get_best_snake()
-        file_name = "best_snake_generatie-%i_score-%i.obj" % (generation+1, best_score)
-        with open("%s/%s" % (output_folder, file_name), "wb") as file:
-            pickle.dump(best_snake, file=file)
+        archive.append(best_snake.dna, generation+1, best_score, best_snake.fitness)
+
+        # save the moves of every game
+        if record_moves:
+            with memory_monitor.phase('save_move_log', generation+1, len(population)):
+                population.save_move_log(os.path.join(move_logs_folder, get_move_log_name(generation+1)),
+                                         generation+1)
 
         # write intermediate results to file
         content = "%i,%0.2f,%0.2f,%0.2f,%0.2f\n" % \
@@ -56,5 +228,24 @@ def start_genetic_algorithm(output_folder, n_generations, population_size, survi
         with open(intermediate_results_path, "a") as file:
             file.write(content)
 
+        # stop early or change the size of the next population
+        stats = {'population_fitness': population_fitness, 'population_score': population_score,
+                 'best_fitness': best_fitness, 'best_score': best_score}
+        event = controller.update(generation+1, stats, len(population), population.get_population_fitness_std())
+        if event['action'] in ('grow', 'shrink'):
+            population.resize_population(event['new_population_size'])
+        stop = event['action'] == 'stop'
+
         # generate new population
-        population.generate_population()
+        with memory_monitor.phase('generate_population', generation+1, len(population)):
+            population.generate_population()
+
+        # save population, so training can be continued from this generation
+        if checkpoint_every and ((generation+1) % checkpoint_every == 0 or generation+1 == n_generations or stop):
+            with memory_monitor.phase('save_population', generation+1, len(population)):
+                population.save_population(checkpoint_path, generation+1)
+                save_checkpoint_state(checkpoint_state_path, generation+1, {'optimizer': population.get_state(),
+                                                                            'controller': controller.get_state()})
+        if stop:
+            break
+    return population
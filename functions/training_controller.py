@@ -0,0 +1,155 @@
+import collections
+import os
+
+# columns of the controller events csv file
+EVENT_COLUMNS = ('generation', 'action', 'population_size', 'new_population_size', 'metric_value',
+                 'generations_without_improvement', 'improvement_rate', 'fitness_cv', 'reason')
+
+
+class TrainingController:
+    """ Follow the learning progress during training. After each generation the controller decides to:
+        1) stop, when the metric has not improved for `patience` generations
+        2) grow the population, when the metric has not improved for `window` generations. More snakes explore more
+        3) shrink the population, when the metric improved in at least a fraction shrink_rate of the last `window`
+           generations and the fitness of the population still varies a lot (coefficient of variation above
+           shrink_cv). Fewer snakes are enough to keep improving
+        4) continue otherwise
+    After a resize the population is not resized again for `window` generations. The stats are tracked incrementally,
+    only the improvements of the last `window` generations are kept.
+
+    Attributes:
+        metric (str): stat that measures progress, e.g. 'best_score' or 'population_score'
+        patience (int): number of generations without improvement after which training stops. 0 never stops
+        min_delta (float): minimum increase of the metric that counts as improvement
+        adapt_population (bool): When True the population is resized
+        min_population_size (int): minimum population size
+        max_population_size (int): maximum population size
+        window (int): number of generations over which the improvement rate is measured
+        resize_factor (float): factor the population size is multiplied or divided by
+        shrink_rate (float): minimum improvement rate to shrink the population, see get_improvement_rate
+        shrink_cv (float): minimum coefficient of variation (std / mean) of the fitness to shrink the population
+        output_path (str): path to csv file the events are appended to. When None the events are only kept in memory
+        best_value (float): best value of the metric so far
+        generations_without_improvement (int): number of generations since the last improvement
+        events (list): events (dict) of the decisions to stop or resize
+    """
+
+    def __init__(self, metric='best_score', patience=0, min_delta=0, adapt_population=False, min_population_size=None,
+                 max_population_size=None, window=10, resize_factor=1.5, shrink_rate=0.3, shrink_cv=1,
+                 output_path=None):
+        self.metric = metric
+        self.patience = patience
+        self.min_delta = min_delta
+        self.adapt_population = adapt_population
+        self.min_population_size = min_population_size
+        self.max_population_size = max_population_size
+        self.window = window
+        self.resize_factor = resize_factor
+        self.shrink_rate = shrink_rate
+        self.shrink_cv = shrink_cv
+        self.output_path = output_path
+
+        self.best_value = None
+        self.generations_without_improvement = 0
+        self.events = []
+        self._improvements = collections.deque(maxlen=window)
+        self._generations_since_resize = 0
+
+        if output_path is not None and not os.path.exists(output_path):
+            with open(output_path, 'w') as file:
+                file.write(','.join(EVENT_COLUMNS) + '\n')
+
+    def get_improvement_rate(self):
+        """ Get fraction of the last `window` generations in which the metric improved """
+        return sum(self._improvements) / max(1, len(self._improvements))
+
+    def update(self, generation, stats, population_size, fitness_std):
+        """ Add the stats of a generation and decide what to do before the next generation
+
+        Args:
+            generation (int): generation
+            stats (dict): stats of the generation, must contain the metric and population_fitness
+            population_size (int): current population size
+            fitness_std (float): standard deviation of the fitness of the population
+
+        Returns:
+            dict: event with the action; 'stop', 'grow', 'shrink' or 'continue', the new population size and the reason
+        """
+        value = stats[self.metric]
+        improved = self.best_value is None or value > self.best_value + self.min_delta
+        if improved:
+            self.best_value = value
+            self.generations_without_improvement = 0
+        else:
+            self.generations_without_improvement += 1
+        self._improvements.append(improved)
+        self._generations_since_resize += 1
+
+        fitness_cv = fitness_std / abs(stats['population_fitness']) if stats['population_fitness'] else 0
+        event = {'generation': generation,
+                 'action': 'continue',
+                 'population_size': population_size,
+                 'new_population_size': population_size,
+                 'metric_value': value,
+                 'generations_without_improvement': self.generations_without_improvement,
+                 'improvement_rate': self.get_improvement_rate(),
+                 'fitness_cv': fitness_cv,
+                 'reason': ''}
+
+        if self.patience and self.generations_without_improvement >= self.patience:
+            event['action'] = 'stop'
+            event['reason'] = "%s did not improve for %i generations" % (self.metric, self.patience)
+        elif self.adapt_population and self._generations_since_resize >= self.window:
+            if self.generations_without_improvement >= self.window:
+                event['new_population_size'] = self.clip_population_size(population_size * self.resize_factor)
+                event['reason'] = "%s did not improve for %i generations" % (self.metric, self.window)
+            elif event['improvement_rate'] >= self.shrink_rate and fitness_cv > self.shrink_cv:
+                event['new_population_size'] = self.clip_population_size(population_size / self.resize_factor)
+                event['reason'] = "%s improved in %i%% of the last %i generations and fitness cv is %.2f" % \
+                                  (self.metric, 100 * event['improvement_rate'], self.window, fitness_cv)
+            if event['new_population_size'] != population_size:
+                event['action'] = 'grow' if event['new_population_size'] > population_size else 'shrink'
+                self._generations_since_resize = 0
+
+        if event['action'] != 'continue':
+            self.log_event(event)
+        return event
+
+    def get_state(self):
+        """ Get the progress that is tracked, so training can be resumed without resetting early stopping
+
+        Returns:
+            dict: state with values that can be saved as JSON
+        """
+        return {'best_value': None if self.best_value is None else float(self.best_value),
+                'generations_without_improvement': self.generations_without_improvement,
+                'improvements': [bool(improved) for improved in self._improvements],
+                'generations_since_resize': self._generations_since_resize}
+
+    def set_state(self, state):
+        """ Restore a state of get_state
+
+        Args:
+            state (dict): state of the controller
+        """
+        self.best_value = state['best_value']
+        self.generations_without_improvement = state['generations_without_improvement']
+        self._improvements = collections.deque(state['improvements'], maxlen=self.window)
+        self._generations_since_resize = state['generations_since_resize']
+
+    def clip_population_size(self, population_size):
+        """ Round population size and clip it between the minimum and maximum population size """
+        population_size = int(round(population_size))
+        if self.min_population_size is not None:
+            population_size = max(self.min_population_size, population_size)
+        if self.max_population_size is not None:
+            population_size = min(self.max_population_size, population_size)
+        return population_size
+
+    def log_event(self, event):
+        """ Save event and append it to the events csv file """
+        self.events.append(event)
+        if self.output_path is not None:
+            with open(self.output_path, 'a') as file:
+                file.write(','.join('%.4g' % event[column] if isinstance(event[column], float) else
+                                    str(event[column]) for column in EVENT_COLUMNS) + '\n')
@@ -0,0 +1,176 @@
+import numpy as np
+
+from functions.brain import get_weights_from_dna_batch, forward_propagation_batch
+from functions.snake import DEATH_CAUSES, calculate_fitness
+from functions.snake_board import get_vision_tables
+
+# change of the head position (row, column) for each decision: ['left', 'right', 'up', 'down']
+DECISION_MOVES = np.asarray([[0, -1], [0, 1], [-1, 0], [1, 0]])
+DIRECTION_RIGHT = 1
+
+
+def play_games_batch(dna, grid_size=10, apples=None, record_moves=False):
+    """ Play Snake with many snakes at once. The snakes play by the same rules as Snake, but the state of all snakes is
+        kept in arrays and the neural networks of all snakes that are still alive are evaluated in one batch. Snakes
+        that died are removed from the arrays.
+
+    Args:
+        dna (np.array): n_snakes by n_genes array with the DNA of each snake
+        grid_size (int): Size of the grid
+        apples (np.array): Locations of the apples that will appear in the game. Either n_apples by 2 when all snakes
+            play with the same apples or n_snakes by n_apples by 2. When None the apples of SnakeBoard are used.
+        record_moves (bool): When True the moves of each snake are recorded as well
+
+    Returns:
+        tuple: tuple containing 3 elements, each an array with a value for each snake:
+            1) fitness
+            2) number of apples found
+            3) number of moves played
+            When record_moves is True a 4th element is added, a dict with
+                moves (list): for each snake an array with the decision (0-3) of each move
+                apple_moves (list): for each snake an array with the number of moves played when each apple was found
+                death_cause (np.array): index of the death cause (see DEATH_CAUSES) of each snake
+    """
+    if apples is None:
+        from functions.snake_board import SnakeBoard
+        apples = SnakeBoard(grid_size).apples
+    shared_apples = apples.ndim == 2
+
+    vision_tables = get_vision_tables(grid_size)
+    n_snakes = dna.shape[0]
+    center = grid_size // 2
+    ring_size = grid_size**2 + 2
+
+    # results of the snakes, filled in when the snakes die
+    fitness = np.zeros(n_snakes)
+    total_apples_found = np.zeros(n_snakes, dtype=int)
+    moves_played = np.zeros(n_snakes, dtype=int)
+    death_cause = np.zeros(n_snakes, dtype=int)
+
+    # the decisions of the snakes that are alive are logged each move, and sorted per snake after the last game
+    move_log = {'id': [], 'direction': [], 'apple_id': [], 'apple_move': []}
+
+    # state of the snakes that are alive. The body is stored in a ring buffer, from tail to the part next to the head,
+    # and in an occupancy grid with a border of 1 cell, so cells around the head can be looked up without bound checks
+    state = {'id': np.arange(n_snakes),
+             'weights': get_weights_from_dna_batch(np.asarray(dna, dtype=np.float64)),
+             'snake_head': np.tile([center, center], (n_snakes, 1)),
+             'direction': np.full(n_snakes, DIRECTION_RIGHT),
+             'body': np.zeros((n_snakes, ring_size, 2), dtype=np.int32),
+             'tail': np.zeros(n_snakes, dtype=int),
+             'end': np.full(n_snakes, 2),
+             'occupied': np.zeros((n_snakes, grid_size + 2, grid_size + 2), dtype=np.int8),
+             'apple_found': np.zeros(n_snakes, dtype=bool),
+             'n_apples': np.ones(n_snakes, dtype=int),
+             'apple': np.tile(apples[0], (n_snakes, 1)) if shared_apples else apples[:, 0].copy(),
+             'total_apples_found': np.zeros(n_snakes, dtype=int),
+             'moves_played': np.zeros(n_snakes, dtype=int),
+             'moves_without_apple': np.zeros(n_snakes, dtype=int)}
+    if not shared_apples:
+        state['apples'] = apples
+    state['body'][:, 0] = [center, center - 2]
+    state['body'][:, 1] = [center, center - 1]
+    state['occupied'][:, center + 1, center - 1] = 1
+    state['occupied'][:, center + 1, center] = 1
+
+    while state['id'].size:
+        n_alive = state['id'].size
+        rows = np.arange(n_alive)
+        snake_head = state['snake_head']
+        occupied = state['occupied']
+
+        # vision of the snakes; apples, edges, body and direction
+        apple_diff = snake_head - state['apple'] + (grid_size - 1)
+        around_head = snake_head[:, None, :] + vision_tables['neighbours'][None, :, :] + 1
+        body_in_sight = occupied[rows[:, None], around_head[:, :, 0], around_head[:, :, 1]] > 0
+        direction_vision = state['direction'][:, None] == np.arange(4)[None, :]
+        vision = np.concatenate([vision_tables['apple'][apple_diff[:, 0], apple_diff[:, 1]],
+                                 vision_tables['edge'][snake_head[:, 0], snake_head[:, 1]],
+                                 body_in_sight,
+                                 direction_vision], axis=1)
+
+        # make decision
+        state['direction'] = np.argmax(forward_propagation_batch(state['weights'], vision), axis=1)
+        if record_moves:
+            move_log['id'].append(state['id'])
+            move_log['direction'].append(state['direction'].astype(np.uint8))
+
+        # update body. The head becomes part of the body and the tail is removed, unless an apple was found
+        state['body'][rows, state['end'] % ring_size] = snake_head
+        state['end'] += 1
+        occupied[rows, snake_head[:, 0] + 1, snake_head[:, 1] + 1] += 1
+        shrink = ~state['apple_found']
+        tail = state['body'][rows[shrink], state['tail'][shrink] % ring_size]
+        occupied[rows[shrink], tail[:, 0] + 1, tail[:, 1] + 1] -= 1
+        state['tail'][shrink] += 1
+        state['apple_found'][:] = False
+
+        # update head
+        snake_head += DECISION_MOVES[state['direction']]
+        state['moves_played'] += 1
+        state['moves_without_apple'] += 1
+
+        # found apple
+        found = np.all(snake_head == state['apple'], axis=1)
+        if np.any(found):
+            state['apple_found'] = found
+            state['total_apples_found'][found] += 1
+            state['moves_without_apple'][found] = 0
+            n_apples = state['n_apples'][found]
+            if shared_apples:
+                state['apple'][found] = apples[n_apples]
+            else:
+                state['apple'][found] = state['apples'][rows[found], n_apples]
+            state['n_apples'][found] += 1
+            if record_moves:
+                move_log['apple_id'].append(state['id'][found])
+                move_log['apple_move'].append(state['moves_played'][found])
+
+        # snake alive
+        hit_wall = np.any(snake_head == -1, axis=1) | np.any(snake_head == grid_size, axis=1)
+        hit_body = occupied[rows, snake_head[:, 0] + 1, snake_head[:, 1] + 1] > 0
+        starved = state['moves_without_apple'] > grid_size**2
+        dead = hit_wall | hit_body | starved
+        if np.any(dead):
+            ids = state['id'][dead]
+            death_cause[ids] = np.where(hit_wall[dead], DEATH_CAUSES.index('wall'),
+                                        np.where(hit_body[dead], DEATH_CAUSES.index('body'),
+                                                 DEATH_CAUSES.index('starvation')))
+            total_apples_found[ids] = state['total_apples_found'][dead]
+            moves_played[ids] = state['moves_played'][dead]
+            fitness[ids] = [calculate_fitness(moves, apples_found) for moves, apples_found in
+                            zip(moves_played[ids].tolist(), total_apples_found[ids].tolist())]
+
+            alive = ~dead
+            state = {key: tuple(weight[alive] for weight in value) if key == 'weights' else value[alive]
+                     for key, value in state.items()}
+
+    if record_moves:
+        return fitness, total_apples_found, moves_played, get_snake_moves(move_log, moves_played, total_apples_found,
+                                                                          death_cause)
+    return fitness, total_apples_found, moves_played
+
+
+def get_snake_moves(move_log, moves_played, total_apples_found, death_cause):
+    """ Sort the moves that are logged each move by play_games_batch per snake
+
+    Args:
+        move_log (dict): for each move the ids of the snakes that were alive and their decisions, and the ids and moves
+            played of the snakes that found an apple
+        moves_played (np.array): number of moves played by each snake
+        total_apples_found (np.array): number of apples found by each snake
+        death_cause (np.array): index of the death cause of each snake
+
+    Returns:
+        dict: moves, apple moves and death cause of each snake, see play_games_batch
+    """
+    log = {}
+    for key, ids_key, values_key, counts in (('moves', 'id', 'direction', moves_played),
+                                             ('apple_moves', 'apple_id', 'apple_move', total_apples_found)):
+        ids = np.concatenate(move_log[ids_key]) if move_log[ids_key] else np.zeros(0, dtype=int)
+        values = np.concatenate(move_log[values_key]) if move_log[values_key] else np.zeros(0, dtype=int)
+        # stable sort keeps the moves of each snake in the order they were played
+        values = values[np.argsort(ids, kind='stable')]
+        log[key] = np.split(values, np.cumsum(counts)[:-1])
+    log['death_cause'] = death_cause
+    return log
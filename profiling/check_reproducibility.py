@@ -0,0 +1,170 @@
+""" Check that training with the same seed gives bit-identical results with every backend, number of processes and chunk
+size, with the population of the genetic algorithm in memory or on disk. Each optimizer is trained a few generations
+with each setting and the intermediate results, the archive with the best snake of each generation and the last
+checkpoint are compared with the first setting of the optimizer. The settings in RESUMED_SETTINGS are also trained with
+train.py in two parts; the second part resumes from the checkpoint of the first part and must give the same results as
+the uninterrupted training session. Before the second part a generation is trained after the checkpoint and thrown away,
+as if training crashed, so the resumed session trains that generation again.
+
+Usage (from the root of the repository):
+    python profiling/check_reproducibility.py [--n-generations 5] [--population-size 300] [--seed 1]
+"""
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from default import file_name_intermediate_results, file_name_checkpoint, file_name_checkpoint_state  # noqa: E402
+from functions.genome_archive import ARCHIVE_FILE_NAME, GenomeArchive  # noqa: E402
+
+# settings of start_genetic_algorithm that must give the same results, per optimizer. The genetic algorithm with a
+# chunk size keeps the population on disk
+SETTINGS = {'ga': [{'backend': 'serial'},
+                   {'backend': 'joblib', 'n_jobs': 1},
+                   {'backend': 'joblib', 'n_jobs': 2},
+                   {'backend': 'vectorized'},
+                   {'backend': 'vectorized', 'memory_budget': 1},
+                   {'backend': 'vectorized', 'chunk_size': 100},
+                   {'backend': 'vectorized', 'chunk_size': 1500},
+                   {'backend': 'joblib', 'n_jobs': 2, 'chunk_size': 100}],
+            'es': [{'backend': 'vectorized', 'optimizer': 'es'},
+                   {'backend': 'joblib', 'n_jobs': 2, 'optimizer': 'es'}]}
+
+# settings that are also trained in two parts, the second part resumes from the checkpoint of the first part
+RESUMED_SETTINGS = {'ga': [{'backend': 'serial'},
+                           {'backend': 'vectorized', 'chunk_size': 100}],
+                    'es': [{'backend': 'vectorized', 'optimizer': 'es'}]}
+
+# files of a training session that are compared
+COMPARED_FILES = (file_name_intermediate_results, ARCHIVE_FILE_NAME, file_name_checkpoint)
+
+
+def train(output_folder, n_generations, population_size, seed, settings):
+    """ Train a few generations
+
+    Args:
+        output_folder (str): folder of the training session
+        n_generations (int): number of generations
+        population_size (int): population size
+        seed (int): seed of the random numbers
+        settings (dict): other arguments of start_genetic_algorithm
+    """
+    from functions.train_ai import start_genetic_algorithm
+
+    os.makedirs(output_folder)
+    start_genetic_algorithm(output_folder, n_generations, population_size, survival_perc=1, parent_perc=20,
+                            mutation_perc=5, checkpoint_every=n_generations, seed=seed, **settings)
+
+
+def train_resumed(output_folder, n_generations, population_size, seed, settings):
+    """ Train a few generations with train.py in two parts. The second part resumes from the checkpoint of the first
+        part, without the seed, which must be read from the config saved by the first part. In between, training
+        crashes one generation after the checkpoint: that generation is trained, but its checkpoint is lost
+
+    Args:
+        output_folder (str): folder of the training session
+        n_generations (int): number of generations of both parts together
+        population_size (int): population size
+        seed (int): seed of the random numbers
+        settings (dict): other arguments of start_genetic_algorithm
+    """
+    from train import main as train_main
+
+    n_first_generations = max(1, n_generations // 2)
+    arguments = ['--output-folder', output_folder, '--population-size', str(population_size), '--seed', str(seed),
+                 '--checkpoint-every', str(n_first_generations), '--n-generations', str(n_first_generations)]
+    for name, value in settings.items():
+        arguments += ['--' + name.replace('_', '-'), str(value)]
+    checkpoint_files = [os.path.join(output_folder, file_name) for file_name in (file_name_checkpoint,
+                                                                                 file_name_checkpoint_state)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_main(arguments)
+
+        # crash after the next generation; its results are saved, but the checkpoint is the one of the first part
+        for path in checkpoint_files:
+            shutil.copy(path, path + '.first')
+        train_main(['--output-folder', output_folder, '--n-generations', str(n_first_generations + 1), '--resume'])
+        for path in checkpoint_files:
+            os.replace(path + '.first', path)
+
+        train_main(['--output-folder', output_folder, '--n-generations', str(n_generations), '--resume'])
+
+
+def read_archive(path):
+    """ Read the index and DNA of an archive. The sequence number in its header counts the writes, which differ when a
+        resumed session removes the genomes of the generations it trains again, so the header is not compared
+
+    Args:
+        path (str): path to archive file
+
+    Returns:
+        bytes: index followed by the DNA of each genome
+    """
+    archive = GenomeArchive(path, mode='r')
+    return archive.index.tobytes() + b''.join(archive.get_dna(generation).tobytes()
+                                               for generation in archive.generations())
+
+
+def compare(folder, other_folder):
+    """ Compare the files of two training sessions
+
+    Args:
+        folder (str): folder of a training session
+        other_folder (str): folder of the other training session
+
+    Returns:
+        list: names of the files that differ
+    """
+    differences = []
+    for file_name in COMPARED_FILES:
+        path, other_path = os.path.join(folder, file_name), os.path.join(other_folder, file_name)
+        if file_name == ARCHIVE_FILE_NAME:
+            identical = read_archive(path) == read_archive(other_path)
+        else:
+            identical = filecmp.cmp(path, other_path, shallow=False)
+        if not identical:
+            differences.append(file_name)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the same seed gives the same results")
+    parser.add_argument('--n-generations', type=int, default=5, help="number of generations")
+    parser.add_argument('--population-size', type=int, default=300, help="population size")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the random numbers")
+    args = parser.parse_args()
+
+    n_differences = 0
+    with tempfile.TemporaryDirectory() as temp_folder:
+        for optimizer, optimizer_settings in SETTINGS.items():
+            folders = []
+            for i, settings in enumerate(optimizer_settings):
+                folders.append(os.path.join(temp_folder, '%s %i' % (optimizer, i)))
+                train(folders[-1], args.n_generations, args.population_size, args.seed, settings)
+
+                differences = compare(folders[0], folders[-1])
+                n_differences += len(differences)
+                print("%-15s %-60s %s" % (optimizer, settings,
+                                          'differs: %s' % ', '.join(differences) if differences else 'identical'))
+
+            # a resumed training session continues with the same population, state and random numbers
+            for i, settings in enumerate(RESUMED_SETTINGS[optimizer]):
+                resumed_folder = os.path.join(temp_folder, '%s resumed %i' % (optimizer, i))
+                train_resumed(resumed_folder, args.n_generations, args.population_size, args.seed, settings)
+                differences = compare(folders[0], resumed_folder)
+                n_differences += len(differences)
+                print("%-15s %-60s %s" % (optimizer, 'resumed %s' % settings,
+                                          'differs: %s' % ', '.join(differences) if differences else 'identical'))
+
+    print("All settings give identical results" if n_differences == 0 else "%i differences" % n_differences)
+    sys.exit(1 if n_differences else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+""" Load test of the policy server. Many games are played at the same time, each game gets its decisions from a policy
+server that runs in the same process. The decisions are compared with the decisions the snake makes itself.
+
+Usage (from the root of the repository):
+    python profiling/load_test_policy_server.py --genome best.genome [--n-games 256] [--n-clients 8]
+        [--n-moves 100000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.genome_file import snake_from_dna  # noqa: E402
+from functions.policy_server import PolicyClient, PolicyServer, load_models  # noqa: E402
+
+
+async def play_game(client, snake, model, n_moves, latencies, mismatches):
+    """ Play games with decisions of the policy server until n_moves moves are played """
+    for _ in range(n_moves):
+        vision = snake.get_vision()
+        start_time = time.perf_counter()
+        direction = await client.decide(vision, model)
+        latencies.append(time.perf_counter() - start_time)
+
+        snake.make_decision()
+        if snake.direction != direction:
+            mismatches.append(snake.direction)
+        snake.direction = direction
+
+        snake.update_snake()
+        snake.found_apple()
+        snake.snake_alive()
+        if not snake.alive:
+            snake.reset_snake()
+
+
+async def load_test(dna, n_games, n_clients, n_moves, batch_window, unix_socket):
+    server = PolicyServer(dna, batch_window=batch_window)
+    listener = await server.start(port=0, unix_socket=unix_socket)
+
+    clients = []
+    for _ in range(n_clients):
+        client = PolicyClient()
+        if unix_socket is None:
+            await client.connect(port=listener.sockets[0].getsockname()[1])
+        else:
+            await client.connect(unix_socket=unix_socket)
+        clients.append(client)
+
+    latencies, mismatches = [], []
+    start_time = time.perf_counter()
+    await asyncio.gather(*[play_game(clients[i_game % n_clients], snake_from_dna(dna[i_game % len(dna)]),
+                                     i_game % len(dna), n_moves // n_games, latencies, mismatches)
+                           for i_game in range(n_games)])
+    duration = time.perf_counter() - start_time
+
+    for client in clients:
+        client.close()
+    listener.close()
+    await server.stop()
+    await listener.wait_closed()
+
+    latencies = np.asarray(latencies) * 1000
+    print("%i decisions in %.2f s (%.0f decisions/s), %i different from local decisions" %
+          (len(latencies), duration, len(latencies) / duration, len(mismatches)))
+    print("client latency p50=%.3f ms p99=%.3f ms" % (np.percentile(latencies, 50), np.percentile(latencies, 99)))
+    print("server " + server.format_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the policy server")
+    parser.add_argument('--genome', nargs='*', default=[], help="genome files, each genome is a model")
+    parser.add_argument('--archive', help="genome archive")
+    parser.add_argument('--generations', nargs='*', type=int, default=[], help="generations of the archive to serve")
+    parser.add_argument('--n-games', type=int, default=256, help="number of games played at the same time")
+    parser.add_argument('--n-clients', type=int, default=8, help="number of connections to the server")
+    parser.add_argument('--n-moves', type=int, default=100000, help="total number of moves of all games")
+    parser.add_argument('--batch-window', type=float, default=0.001)
+    parser.add_argument('--unix-socket', help="use a unix socket instead of TCP")
+    args = parser.parse_args()
+
+    dna = load_models(args.genome, args.archive, args.generations)
+    # the event loop is created and closed explicitly, so the load test also runs on Python 3.6 (see Dockerfile)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(load_test(dna, args.n_games, args.n_clients, args.n_moves, args.batch_window,
+                                          args.unix_socket))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
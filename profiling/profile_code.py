@@ -1,7 +1,16 @@
 import cProfile
+import glob
+import os
 import pstats
+import shutil
+import sys
 from functools import wraps
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.sampling_profiler import SAMPLING_INTERVAL_ENV, SAMPLING_PROFILE_DIR_ENV, SamplingProfiler, \
+    get_function_samples, merge_collapsed, set_profiled_process, write_collapsed  # noqa: E402
+
 
 def profile(output_file=None, sort_by='cumulative', lines_to_print=None, strip_dirs=False):
     """A time profiler decorator.
@@ -51,4 +60,76 @@ def profile(output_file=None, sort_by='cumulative', lines_to_print=None, strip_d
 
         return wrapper
 
-    return inner
\ No newline at end of file
+    return inner
+
+
+def sampling_profile(output_file=None, interval=0.005, lines_to_print=20):
+    """A sampling profiler decorator.
+    The call stack of the decorated function is sampled at a fixed interval, so the overhead does not depend on the
+    number of function calls. Worker processes that play the games (joblib workers, out of core chunks, sweep trials)
+    are sampled as well, their samples are merged with the samples of the main process.
+    Args:
+        output_file: str or None. Default is None
+            Path of the output file with collapsed stacks, which can be turned into a flamegraph with e.g.
+            flamegraph.pl or speedscope. The stacks of the main process start with 'main', the stacks of the workers
+            with 'worker'.
+            If it's None, the name of the decorated function is used.
+        interval: float
+            Time in seconds between samples
+        lines_to_print: int or None
+            Number of functions with the most samples that are printed. None prints nothing
+    Returns:
+        Profile of the decorated function
+    """
+
+    def inner(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            _output_file = output_file or func.__name__ + '.collapsed'
+            worker_folder = _output_file + '.workers'
+            shutil.rmtree(worker_folder, ignore_errors=True)
+            os.makedirs(worker_folder)
+
+            # the environment is inherited by the worker processes that are started by the decorated function
+            environment = {key: os.environ.get(key) for key in (SAMPLING_PROFILE_DIR_ENV, SAMPLING_INTERVAL_ENV)}
+            os.environ[SAMPLING_PROFILE_DIR_ENV] = os.path.abspath(worker_folder)
+            os.environ[SAMPLING_INTERVAL_ENV] = str(interval)
+            profiler = SamplingProfiler(interval)
+            set_profiled_process(os.getpid())
+            profiler.start()
+            try:
+                retval = func(*args, **kwargs)
+            finally:
+                profiler.stop()
+                set_profiled_process(None)
+                for key, value in environment.items():
+                    if value is None:
+                        os.environ.pop(key)
+                    else:
+                        os.environ[key] = value
+
+            samples = merge_collapsed(glob.glob(os.path.join(worker_folder, '*.collapsed')), prefix='worker')
+            samples.update({'main;' + stack: count for stack, count in profiler.samples.items()})
+            write_collapsed(_output_file, samples)
+            shutil.rmtree(worker_folder)
+
+            if lines_to_print:
+                self_samples, total_samples = get_function_samples(samples)
+                n_samples = sum(samples.values())
+                print("%i samples, %s" % (n_samples, _output_file))
+                print("%8s %8s  function" % ('self %', 'total %'))
+                for function, count in self_samples.most_common(lines_to_print):
+                    print("%8.1f %8.1f  %s" % (100 * count / n_samples, 100 * total_samples[function] / n_samples,
+                                              function))
+            return retval
+
+        return wrapper
+
+    return inner
+
+
+if __name__ == '__main__':
+    # profile headless training, the arguments are passed to train.py
+    import train
+
+    sampling_profile('train.collapsed')(train.main)()
@@ -0,0 +1,55 @@
+""" Measure cold start time of the modules that are imported by the dashboard, the headless trainer and the worker
+processes. Each import is done in a new Python process, the start time of an empty Python process is subtracted.
+
+Usage (from the root of the repository):
+    python profiling/startup_time.py [--repeat 5] [module ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# modules imported at start up of the dashboard, the headless trainer and the joblib worker processes
+DEFAULT_MODULES = ['snake_dashboard', 'train', 'functions.train_ai', 'functions.game_backends', 'functions.snake']
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(statement, repeat):
+    """ Time a statement in new Python processes
+
+    Args:
+        statement (str): Python statement
+        repeat (int): number of times the statement is timed
+
+    Returns:
+        float: fastest time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement], cwd=ROOT_FOLDER)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time of modules")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="modules to import")
+    parser.add_argument('--repeat', type=int, default=5, help="number of times each import is timed")
+    args = parser.parse_args()
+
+    baseline = time_import('pass', args.repeat)
+    print("%-30s %10.3f s" % ('python interpreter', baseline))
+    for module in args.modules:
+        try:
+            import_time = time_import('import %s' % module, args.repeat) - baseline
+        except subprocess.CalledProcessError:
+            print("%-30s %10s" % (module, 'failed'))
+            continue
+        print("%-30s %10.3f s" % (module, import_time))
+
+
+if __name__ == '__main__':
+    main()
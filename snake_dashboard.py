@@ -1,20 +1,66 @@
+import collections
 import os
 from datetime import datetime
-import re
-import pickle
-import pandas as pd
+import numpy as np
 
 import dash
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-import plotly.graph_objects as go
+from dash.dependencies import Input, Output, State
 
-from functions.train_ai import start_genetic_algorithm
+# pandas, plotly.graph_objects and the training code are imported in the callbacks that use them, so the dashboard
+# starts without loading them
 from functions.generate_dashboard_layout import generate_layout
-from default import output_path, file_name_intermediate_results
+from functions.genome_archive import ARCHIVE_FILE_NAME, GenomeArchive
+from default import output_path, file_name_intermediate_results, folder_name_move_logs
 
 app = dash.Dash(external_stylesheets=[dbc.themes.MINTY])
-app.layout = generate_layout()
+app.layout = generate_layout
+
+# maximum number of browser sessions of which the snake and gallery that are being replayed are kept
+MAX_SESSIONS = 16
+
+# snake that is being replayed by each browser session, stored by session id with its archive path and generation.
+# Keeping them in memory avoids (un)pickling the snake on every frame
+replays = collections.OrderedDict()
+
+# gallery that is being replayed by each browser session, stored by session id with its move log path and number of
+# snakes
+galleries = collections.OrderedDict()
+
+# colors of the cells of a gallery; empty, body, head, apple and dead
+GALLERY_COLORSCALE = [[0, 'White'], [0.2, 'White'], [0.2, 'Red'], [0.4, 'Red'], [0.4, 'Black'], [0.6, 'Black'],
+                      [0.6, 'Green'], [0.8, 'Green'], [0.8, 'Grey'], [1, 'Grey']]
+
+
+def set_replay(replaying, session_id, location, replay):
+    """ Keep the replay of a browser session. The previous replay of the session and the replays of the oldest
+        sessions beyond MAX_SESSIONS are dropped
+
+    Args:
+        replaying (collections.OrderedDict): replays by session id, e.g. replays or galleries
+        session_id (str): id of the browser session
+        location (str): location of the replay, e.g. archive path and generation
+        replay (object): snake or gallery that is replayed
+    """
+    replaying.pop(session_id, None)
+    replaying[session_id] = (location, replay)
+    while len(replaying) > MAX_SESSIONS:
+        replaying.popitem(last=False)
+
+
+def get_replay(replaying, session_id, location):
+    """ Get the replay of a browser session
+
+    Args:
+        replaying (collections.OrderedDict): replays by session id, e.g. replays or galleries
+        session_id (str): id of the browser session
+        location (str): location of the replay
+
+    Returns:
+        object: snake or gallery. None when the session is not replaying this location
+    """
+    replay_location, replay = replaying.get(session_id, (None, None))
+    return replay if replay_location == location else None
 
 
 # Callbacks for tab 1
@@ -23,16 +69,18 @@ app.layout = generate_layout()
                Input('output_folder', 'children'),
                Input('number_of_generations', 'value'),
                Input('population_size', 'value'),
+               Input('grid_size', 'value'),
                Input('survival_perc', 'value'),
                Input('parent_perc', 'value'),
                Input('mutation_perc', 'value')])
-def train_ai(button_triggered, output_folder, number_of_generations, population_size, survival_perc, parent_perc,
-             mutation_perc):
+def train_ai(button_triggered, output_folder, number_of_generations, population_size, grid_size, survival_perc,
+             parent_perc, mutation_perc):
     context = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
     # if the train button is triggered, start the genetic algorithm
     if button_triggered and context == 'train_ai_button_triggered':
+        from functions.train_ai import start_genetic_algorithm
         start_genetic_algorithm(output_folder, number_of_generations, population_size, survival_perc, parent_perc,
-                                mutation_perc)
+                                mutation_perc, grid_size=grid_size)
     return False
 
 
@@ -56,11 +104,14 @@ def train_ai_triggered(_):
                Input('output_folder', 'children'),
                Input('metric_drop_down', 'value')])
 def update_graph(_, output_folder, metric):
+    import plotly.graph_objects as go
+
     if output_folder is not None:
         intermediate_results_path = os.path.join(output_folder, file_name_intermediate_results)
         if os.path.exists(intermediate_results_path):
 
             # read intermediate results
+            import pandas as pd
             df = pd.read_csv(intermediate_results_path)
 
             # depending on the metric select the correct columns
@@ -91,9 +142,7 @@ def update_graph(_, output_folder, metric):
     return go.Figure()
 
 # Callbacks for tab 2
-@app.callback(Output('session_selection', 'options'),
-              Input('session_interval', 'n_intervals'))
-def set_session_selection(_):
+def get_session_options():
     sessions = sorted(os.listdir(output_path), reverse=True)
     options = []
     for session in sessions:
@@ -102,31 +151,26 @@ def set_session_selection(_):
                             'value': session})
     return options
 
+
+@app.callback(Output('session_selection', 'options'),
+              Input('session_interval', 'n_intervals'))
+def set_session_selection(_):
+    return get_session_options()
+
+
 @app.callback(Output('generation_selection', 'options'),
               Input('session_selection', 'value'))
 def set_generation_selection(session_name):
     options = []
     if session_name is not None:
-        path = os.path.join(output_path, session_name)
-        if os.path.isdir(path):
-            generations = os.listdir(path)
-            for generation in generations:
-                if os.path.isfile(os.path.join(path, generation)) and os.path.splitext(generation)[1] == '.obj':
-                    try:
-                        match = re.search(r"^best_snake_generatie-(\d+)_score-(\d+).obj$", generation).groups()
-
-                        options.append({'label': 'Generation %s, score=%s' % (match[0], match[1]),
-                                        'value': generation,
-                                        'generation': int(match[0])})
-                    except:
-                        pass
-            # sort generations from high to low
-            options = sorted(options, key=lambda k: k['generation'], reverse=True)
+        archive_path = os.path.join(output_path, session_name, ARCHIVE_FILE_NAME)
+        if os.path.isfile(archive_path):
+            archive = GenomeArchive(archive_path, mode='r')
 
-            # remove key='generation' because only the keys label and value are excepted by drop down component
-            for option in options:
-                option.pop('generation')
-            return options
+            # sort generations from high to low
+            for record in np.sort(archive.index, order='generation')[::-1]:
+                options.append({'label': 'Generation %i, score=%i' % (record['generation'], record['score']),
+                                'value': int(record['generation'])})
     return options
 
 
@@ -134,16 +178,14 @@ def set_generation_selection(session_name):
               [Input('session_selection', 'value'),
                Input('generation_selection', 'value'),
                Input('play_ai_button', 'n_clicks'),
-               Input('snake_location', 'children')])
-def ai_plays_snake(session, generation, _, snake):
+               Input('snake_location', 'children')],
+              State('session_id', 'children'))
+def ai_plays_snake(session, generation, _, snake, session_id):
     context = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
     if context == 'play_ai_button':
-        snake_location = os.path.join(output_path, session, generation)
-        with open(snake_location, 'rb') as file:
-            snake = pickle.load(file)
-            snake.reset_snake()
-        with open(snake_location, 'wb') as file:
-            pickle.dump(snake, file)
+        archive = GenomeArchive(os.path.join(output_path, session, ARCHIVE_FILE_NAME), mode='r')
+        snake_location = '%s:%i' % (archive.path, generation)
+        set_replay(replays, session_id, snake_location, archive.get_snake(generation))
 
         return snake_location
     return snake
@@ -152,14 +194,15 @@ def ai_plays_snake(session, generation, _, snake):
 @app.callback(Output('play_snake', 'figure'),
               [Input('snake_interval', 'n_intervals'),
                Input('snake_location', 'children'),
-               Input('play_snake', 'figure')])
-def update_graph(_, snake_location, fig):
+               Input('play_snake', 'figure')],
+              State('session_id', 'children'))
+def update_graph(_, snake_location, fig, session_id):
+    import plotly.graph_objects as go
 
-    if snake_location is not None:
+    snake = get_replay(replays, session_id, snake_location)
+    if snake is not None:
         print("snake_location = %s" % snake_location)
 
-        with open(snake_location, 'rb') as file:
-            snake = pickle.load(file)
         if snake.alive:
             fig = go.Figure()
 
@@ -219,12 +262,99 @@ def update_graph(_, snake_location, fig):
 
             # after drawing the snake, let the snake take another step
             snake.snake_move()
-            with open(snake_location, 'wb') as file:
-                pickle.dump(snake, file)
 
             return fig
     return fig
 
 
+# Callbacks for tab 3
+@app.callback(Output('gallery_session_selection', 'options'),
+              Input('session_interval', 'n_intervals'))
+def set_gallery_session_selection(_):
+    return get_session_options()
+
+
+@app.callback(Output('gallery_generation_selection', 'options'),
+              Input('gallery_session_selection', 'value'))
+def set_gallery_generation_selection(session_name):
+    from functions.move_log import MOVE_LOG_EXTENSION
+
+    options = []
+    if session_name is not None:
+        move_logs_folder = os.path.join(output_path, session_name, folder_name_move_logs)
+        if os.path.isdir(move_logs_folder):
+            # sort generations from high to low
+            for file_name in sorted(os.listdir(move_logs_folder), reverse=True):
+                if file_name.endswith(MOVE_LOG_EXTENSION):
+                    options.append({'label': 'Generation %i' % int(file_name.split('_')[1].split('.')[0]),
+                                    'value': os.path.join(move_logs_folder, file_name)})
+    return options
+
+
+@app.callback(Output('gallery_location', 'children'),
+              [Input('gallery_generation_selection', 'value'),
+               Input('gallery_size', 'value'),
+               Input('play_gallery_button', 'n_clicks'),
+               Input('gallery_location', 'children')],
+              State('session_id', 'children'))
+def play_gallery(move_log_path, n_snakes, _, gallery_location, session_id):
+    context = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    if context == 'play_gallery_button' and move_log_path is not None:
+        from functions.gallery import GameGallery
+        from functions.move_log import MoveLog
+
+        # decode the best games of the generation
+        move_log = MoveLog(move_log_path)
+        games = [move_log.decode_game(game) for game in move_log.top(n_snakes or 16)]
+        gallery_location = '%s:%i' % (move_log_path, len(games))
+        set_replay(galleries, session_id, gallery_location, GameGallery(games, move_log.grid_size, move_log.apple_seed))
+    return gallery_location
+
+
+@app.callback(Output('gallery', 'figure'),
+              [Input('gallery_interval', 'n_intervals'),
+               Input('gallery_location', 'children')],
+              State('session_id', 'children'))
+def update_gallery(_, gallery_location, session_id):
+    import plotly.graph_objects as go
+
+    gallery = get_replay(galleries, session_id, gallery_location)
+    if gallery is None:
+        return go.Figure()
+
+    # all boards are a single heatmap of the frame buffer, only the next move is drawn in the buffer
+    context = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    if context == 'gallery_interval' and not gallery.step():
+        return dash.no_update
+
+    fig = go.Figure(go.Heatmap(z=gallery.frame, zmin=0, zmax=4, colorscale=GALLERY_COLORSCALE, showscale=False,
+                               hoverinfo='skip'))
+    centers = gallery.get_tile_centers()
+    fig.update_layout(title={'text': 'Move %i' % gallery.move,
+                             'y': 0.95,
+                             'x': 0.5,
+                             'xanchor': 'center',
+                             'yanchor': 'top'},
+                      annotations=[{'x': center[1], 'y': center[0] - gallery.grid_size / 2, 'yshift': 10,
+                                    'text': 'score=%i' % score, 'showarrow': False}
+                                   for center, score in zip(centers, gallery.scores.tolist())],
+                      hovermode=False,
+                      width=800,
+                      height=800,
+                      paper_bgcolor='rgba(0,0,0,0)',
+                      plot_bgcolor='rgba(0,0,0,0)',
+                      xaxis=dict(showgrid=False,
+                                 zeroline=False,
+                                 ticks='',
+                                 showticklabels=False),
+                      yaxis=dict(autorange='reversed',
+                                 scaleanchor='x',
+                                 showgrid=False,
+                                 zeroline=False,
+                                 ticks='',
+                                 showticklabels=False))
+    return fig
+
+
 if __name__ == '__main__':
     app.run_server(host="0.0.0.0", port=8050)
@@ -0,0 +1,65 @@
+""" Sweep over parameters of the genetic algorithm with successive halving. Settings are read from a JSON config file
+(see sweep_config.json). The comparison table of all trials is written to sweep_results.csv in the output folder.
+
+Usage:
+    python sweep.py --config sweep_config.json [--output-folder output/sweep]
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+from default import output_path
+
+DEFAULT_CONFIG = {'search': 'grid',
+                  'space': {},
+                  'fixed': {'population_size': 1000, 'survival_perc': 1, 'parent_perc': 20, 'mutation_perc': 5},
+                  'n_trials': 20,
+                  'seed': None,
+                  'min_generations': 10,
+                  'max_generations': 270,
+                  'eta': 3,
+                  'metric': 'best_score',
+                  'n_workers': None,
+                  'settings': {'grid_size': 10, 'backend': 'vectorized'}}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Sweep over parameters of the genetic algorithm")
+    parser.add_argument('--config', required=True, help="path to JSON config file")
+    parser.add_argument('--output-folder', help="folder for results, default is a new sweep in the output folder")
+    args = parser.parse_args(args)
+
+    config = dict(DEFAULT_CONFIG)
+    with open(args.config) as file:
+        config.update(json.load(file))
+
+    from functions.hyperparameter_sweep import HyperparameterSweep, generate_grid, generate_random
+
+    if config['search'] == 'grid':
+        trials = generate_grid(config['space'])
+    elif config['search'] == 'random':
+        trials = generate_random(config['space'], config['n_trials'], config['seed'])
+    else:
+        raise ValueError("Search %s is not supported, choose grid or random" % config['search'])
+    # parameters that are not part of the search space get their fixed value
+    trials = [dict(DEFAULT_CONFIG['fixed'], **dict(config['fixed'], **params)) for params in trials]
+
+    output_folder = args.output_folder
+    if output_folder is None:
+        output_folder = os.path.join(output_path, 'sweep %s' % datetime.now().strftime("%Y-%m-%d %H:%M"))
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+    with open(os.path.join(output_folder, 'sweep_config.json'), 'w') as file:
+        json.dump(config, file, indent=4)
+
+    sweep = HyperparameterSweep(output_folder, trials, min_generations=config['min_generations'],
+                                max_generations=config['max_generations'], eta=config['eta'], metric=config['metric'],
+                                settings=config['settings'], n_workers=config['n_workers'])
+    print("Sweep over %i trials in %s" % (len(trials), output_folder))
+    ranking = sweep.run()
+    print("Best trial: %s %s" % (ranking[0], sweep.get_params(ranking[0])))
+
+
+if __name__ == '__main__':
+    main()
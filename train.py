@@ -0,0 +1,149 @@
+""" Train the snake AI without the dashboard. Settings are read from a JSON config file and can be overridden on the
+command line.
+
+Usage:
+    python train.py --config train_config.json [--population-size 500] [--backend vectorized] ...
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+from default import output_path, file_name_train_config
+
+DEFAULT_CONFIG = {'n_generations': 400,
+                  'population_size': 1000,
+                  'survival_perc': 1,
+                  'parent_perc': 20,
+                  'mutation_perc': 5,
+                  'grid_size': 10,
+                  'backend': 'joblib',
+                  'n_jobs': None,
+                  'checkpoint_every': 10,
+                  'chunk_size': None,
+                  'memory_budget': None,
+                  'trace_memory': False,
+                  'optimizer': 'ga',
+                  'es_sigma': 0.5,
+                  'es_learning_rate': 0.1,
+                  'seed': None,
+                  'patience': 0,
+                  'min_delta': 0,
+                  'plateau_metric': 'best_score',
+                  'adapt_population': False,
+                  'min_population_size': None,
+                  'max_population_size': None,
+                  'record_moves': False,
+                  'output_folder': None,
+                  'resume': False}
+
+
+def load_config(config_path=None, overrides=None):
+    """ Load training config. Values missing in the config file are taken from DEFAULT_CONFIG
+
+    Args:
+        config_path (str): path to JSON config file. When None only the default config and overrides are used
+        overrides (dict): values that override the config file. Values that are None are ignored
+
+    Returns:
+        dict: training config
+    """
+    config = dict(DEFAULT_CONFIG)
+    if config_path is not None:
+        with open(config_path) as file:
+            config.update(json.load(file))
+    config.update({key: value for key, value in (overrides or {}).items() if value is not None})
+
+    unknown_keys = set(config) - set(DEFAULT_CONFIG)
+    if unknown_keys:
+        raise ValueError("Unknown config keys: %s" % ', '.join(sorted(unknown_keys)))
+
+    from functions.snake_board import check_grid_size
+    check_grid_size(config['grid_size'])
+    return config
+
+
+def parse_grid_size(value):
+    """ Parse grid size argument, the grid must be large enough to play on """
+    from functions.snake_board import check_grid_size
+
+    try:
+        check_grid_size(int(value))
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return int(value)
+
+
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Train the snake AI without the dashboard")
+    parser.add_argument('--config', help="path to JSON config file")
+    parser.add_argument('--n-generations', type=int, help="number of generations")
+    parser.add_argument('--population-size', type=int, help="population size")
+    parser.add_argument('--survival-perc', type=float, help="survival percentage (0-100)")
+    parser.add_argument('--parent-perc', type=float, help="parent percentage (0-100)")
+    parser.add_argument('--mutation-perc', type=float, help="mutation percentage (0-100)")
+    parser.add_argument('--grid-size', type=parse_grid_size, help="size of the grid")
+    parser.add_argument('--backend', choices=['serial', 'joblib', 'vectorized'], help="backend used to play games")
+    parser.add_argument('--n-jobs', type=int, help="number of processes used by the joblib backend")
+    parser.add_argument('--checkpoint-every', type=int, help="save the population every n generations (0 = never)")
+    parser.add_argument('--chunk-size', type=int,
+                        help="keep the population on disk and play the games in chunks of this size")
+    parser.add_argument('--memory-budget', type=float,
+                        help="maximum memory in MB, fewer games are played at the same time when it would be exceeded")
+    parser.add_argument('--trace-memory', action='store_true', default=None,
+                        help="trace Python allocations with tracemalloc (slow)")
+    parser.add_argument('--optimizer', choices=['ga', 'es'],
+                        help="genetic algorithm (ga) or evolution strategies (es)")
+    parser.add_argument('--es-sigma', type=float, help="standard deviation of the perturbations of es")
+    parser.add_argument('--es-learning-rate', type=float, help="learning rate of es")
+    parser.add_argument('--seed', type=int, help="seed of the random numbers, the same seed gives the same results")
+    parser.add_argument('--patience', type=int,
+                        help="stop when the plateau metric has not improved for this many generations (0 = never)")
+    parser.add_argument('--min-delta', type=float, help="minimum increase of the plateau metric that is an improvement")
+    parser.add_argument('--plateau-metric',
+                        choices=['best_score', 'best_fitness', 'population_score', 'population_fitness'])
+    parser.add_argument('--adapt-population', action='store_true', default=None,
+                        help="grow the population when training stagnates, shrink it when training improves quickly")
+    parser.add_argument('--min-population-size', type=int)
+    parser.add_argument('--max-population-size', type=int)
+    parser.add_argument('--record-moves', action='store_true', default=None,
+                        help="save the moves of every game of each generation to a move log file")
+    parser.add_argument('--output-folder', help="folder for results, default is a new session in the output folder")
+    parser.add_argument('--resume', action='store_true', default=None,
+                        help="continue from the checkpoint in the output folder")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = vars(parse_arguments(args))
+    config = load_config(args.pop('config'), args)
+
+    # a resumed session continues with its saved config and seed, so it uses the same random streams. Values given on
+    # the command line still override the saved config
+    saved_config_path = os.path.join(config['output_folder'] or '', file_name_train_config)
+    resumed = config['resume'] and config['output_folder'] is not None and os.path.exists(saved_config_path)
+    if resumed:
+        config = load_config(saved_config_path, dict(args, resume=True))
+
+    output_folder = config.pop('output_folder')
+    if output_folder is None:
+        output_folder = os.path.join(output_path, datetime.now().strftime("%Y-%m-%d %H:%M"))
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+
+    # imported after parsing the arguments, so --help and invalid arguments return immediately
+    from functions.random_streams import get_seed
+    from functions.train_ai import start_genetic_algorithm
+
+    # the seed is saved in the config of a new session, so the training session can be repeated and resumed
+    if not resumed:
+        config['seed'] = get_seed(config['seed'])
+        with open(os.path.join(output_folder, file_name_train_config), 'w') as file:
+            json.dump(config, file, indent=4)
+
+    print("Training snake AI in %s" % output_folder)
+    start_genetic_algorithm(output_folder, **config)
+
+
+if __name__ == '__main__':
+    main()